@@ -0,0 +1,60 @@
+# Benchmark of bgp_parser on a synthetic route-server sized "show ip bgp summary" output.
+# The old uncompiled regex from inactive_peers.py is measured on the same output for comparison.
+# % ./bench_bgp_parser.py --peers 100000
+# legacy regex:              100000 peers  2.908 s     34384 peers/s
+# bgp_parser:                100000 peers  0.987 s    101290 peers/s
+# bgp_parser(no header):     100000 peers  1.339 s     74702 peers/s
+# (legacy regex only finds rows, bgp_parser also converts counters and uptime)
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from bgp_parser import parse_bgp_summary
+import argparse
+import random
+import re
+import time
+
+HEADER = "Description              Neighbor         V  AS           MsgRcvd   MsgSent  InQ OutQ  Up/Down State   PfxRcd PfxAcc"
+LEGACY_REGEX = (r'(?P<description>.*?)\s+(?P<ip>\S+)\s+\d\s+(?P<as>\S+)(?:\s+\d+\s+){4}(?P<uptime>\S+)\s+(?P<state>\S+)')
+
+def make_summary(peers, header = True):
+    '''
+    Allows to make a synthetic "show ip bgp summary" output with the given number of peers.
+    '''
+    random.seed(peers)
+    lines = ["BGP summary information for VRF default", "Router identifier 10.0.0.1, local AS number 65000"]
+    if header:
+        lines.append(HEADER)
+    for number in range(peers):
+        ip = f"10.{number >> 16 & 255}.{number >> 8 & 255}.{number & 255}"
+        description = f"PEER-{number}"
+        if random.random() < 0.8:
+            uptime, state, prefixes = f"{random.randint(0, 50)}d{random.randint(0, 23):02}h", "Estab", f"{random.randint(0, 900000):>8} {random.randint(0, 900000):>6}"
+        else:
+            uptime, state, prefixes = f"{random.randint(0, 23):02}:{random.randint(0, 59):02}:{random.randint(0, 59):02}", "Active", ""
+        lines.append(f"{description:<24} {ip:<16} 4  {65000 + number % 1000:<12} {random.randint(0, 10**6):>8} {random.randint(0, 10**6):>9} "
+                     f"{0:>4} {0:>4} {uptime:>8} {state:<7} {prefixes}")
+    return "\n".join(lines)
+
+def measure(name, function, output, repeat):
+    '''
+    Allows to run function on output repeat times and print the best result.
+    '''
+    best = None
+    for attempt in range(repeat):
+        start = time.perf_counter()
+        count = len(function(output))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name + ':':<24} {count:>8} peers  {best:.3f} s  {count / best:>8.0f} peers/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--peers", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    output = make_summary(args.peers)
+    measure("legacy regex", lambda text: list(re.finditer(LEGACY_REGEX, text)), output, args.repeat)
+    measure("bgp_parser", parse_bgp_summary, output, args.repeat)
+    measure("bgp_parser(no header)", parse_bgp_summary, make_summary(args.peers, header = False), args.repeat)
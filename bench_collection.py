@@ -0,0 +1,152 @@
+# Throughput benchmark of the collection scripts against the local device simulator(device_sim.py), no real devices are needed.
+# Every scenario is run on 10, 100 and 1000 simulated devices(--sizes), for each run devices/sec, p50/p99 per device latency
+# and peak Python memory(tracemalloc, the simulator works in the same process, so its memory is included) are reported.
+# Scenarios:
+# - send_show_command - find_ip.py with --cache: the whole "show ip bgp summary | exclude Estab" output is gathered and then parsed;
+# - collect_inactive_peers - find_ip.py: the same output parsed while it is received(capture.py);
+# - inactive_peers - inactive_peers.py --watch: one device poll of "sh ip bgp summary | exclude Estab"(collect_peers);
+# - send_config_commands - find_and_change_description.py: push of two config commands;
+# - gather_output - show_servers_versions.py: sudo su/cd/cat on a CentOS server(it has three 1 second sleeps inside);
+# - versions_exec - show_servers_versions.py --exec: one exec channel command for versions of all containers;
+# - bgp_tshoot - parse_bgp, log_bgp, ping_check and tcp_dump on one session.
+# % ./bench_collection.py --sizes 10 50 --limit 20 --latency 0.01
+# scenario               devices  devices/s    p50 ms    p99 ms  peak MB  errors
+# send_show_command           10       14.4     642.0     690.8      0.9       0
+# send_show_command           50       18.5     929.5    1127.7      3.1       0
+# collect_inactive_peers      10       14.9     599.4     619.4      0.7       0
+# collect_inactive_peers      50       21.9     767.5     952.9      3.1       0
+# inactive_peers              10       16.6     545.1     592.8      0.8       0
+# inactive_peers              50       20.3     836.6    1015.1      3.1       0
+# send_config_commands        10       10.5     915.7     933.6      0.7       0
+# send_config_commands        50       13.7    1285.4    1521.9      2.9       0
+# gather_output               10        3.1    3140.0    3181.2      0.7       0
+# gather_output               50        5.2    3218.8    3276.4      3.1       0
+# versions_exec               10       42.2     192.4     215.0      0.7       0
+# versions_exec               50       48.0     339.9     496.6      3.0       0
+# bgp_tshoot                  10        9.0    1066.7    1079.9      0.8       0
+# bgp_tshoot                  50       12.6    1328.7    1626.9      3.2       0
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+from device_sim import DeviceSimulator
+import find_ip
+import find_and_change_description
+import inactive_peers
+import show_servers_versions
+import bgp_tshoot
+import argparse
+import time
+import tracemalloc
+
+def scenario_show(simulator, number):
+    device = simulator.device(number)
+    find_ip.parse_inactive_peers(find_ip.send_show_command(device, "show ip bgp summary | exclude Estab"))
+
+def scenario_collect(simulator, number):
+    device = simulator.device(number)
+    find_ip.collect_inactive_peers(device, "show ip bgp summary | exclude Estab")
+
+def scenario_inactive_peers(simulator, number):
+    device = simulator.device(number)
+    inactive_peers.collect_peers(device, "sh ip bgp summary | exclude Estab")
+
+def scenario_config(simulator, number):
+    device = simulator.device(number)
+    find_and_change_description.send_config_commands(device, ["interface Po1", "description UPLINK-ISP1"])
+
+def scenario_gather_output(simulator, number):
+    device = simulator.device(number)
+    show_servers_versions.gather_output(device["hostname"], username = device["username"], port = device["port"], password = "sim")
+
+def scenario_versions_exec(simulator, number):
+    device = simulator.device(number)
+    show_servers_versions.gather_versions_exec(device["hostname"], username = device["username"], port = device["port"], password = "sim")
+
+def scenario_bgp_tshoot(simulator, number):
+    device = simulator.device(number)
+    bgp_neighbor = "10.0.0.1"
+    with bgp_tshoot.connect(device) as ssh:
+        bgp_tshoot.parse_bgp(ssh, bgp_tshoot.CHECKS["bgp"].format(bgp_neighbor))
+        bgp_tshoot.log_bgp(ssh, bgp_tshoot.CHECKS["log"].format(bgp_neighbor))
+        bgp_tshoot.ping_check(ssh, bgp_tshoot.CHECKS["ping"].format(bgp_neighbor))
+        bgp_tshoot.tcp_dump(ssh, bgp_tshoot.TCP_DUMP_COMMAND.format(bgp_neighbor), timeout = 10)
+
+SCENARIOS = {
+    "send_show_command": ("eos", scenario_show),
+    "collect_inactive_peers": ("eos", scenario_collect),
+    "inactive_peers": ("eos", scenario_inactive_peers),
+    "send_config_commands": ("eos", scenario_config),
+    "gather_output": ("centos", scenario_gather_output),
+    "versions_exec": ("centos", scenario_versions_exec),
+    "bgp_tshoot": ("eos", scenario_bgp_tshoot),
+}
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+def run_scenario(function, simulator, size, limit):
+    '''
+    Allows to run the scenario on size devices with limit threads and return a dictionary with measurements.
+    '''
+    def timed(number):
+        start = time.perf_counter()
+        function(simulator, number)
+        return time.perf_counter() - start
+
+    latencies = []
+    errors = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers = limit) as executor:
+        for future in [executor.submit(timed, number) for number in range(size)]:
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "devices": size,
+        "devices_per_second": size / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_mb": peak / 2**20,
+        "errors": errors,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--limit", type=int, default=50, help="number of threads")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--peers", type=int, default=20, help="number of bgp peers per switch")
+    parser.add_argument("--log-lines", type=int, default=50)
+    parser.add_argument("--file-lines", type=int, default=30, help="number of lines of the file with VERSION string")
+    parser.add_argument("--containers", type=int, default=3, help="number of docker containers per server")
+    args = parser.parse_args()
+    simulators = {
+        kind: DeviceSimulator(kind = kind, latency = args.latency, jitter = args.jitter, failure_rate = args.failure_rate,
+                              peers = args.peers, log_lines = args.log_lines, file_lines = args.file_lines,
+                              containers = args.containers).start()
+        for kind in ("eos", "centos")
+    }
+    print(f"{'scenario':<22} {'devices':>7} {'devices/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak MB':>8} {'errors':>7}")
+    try:
+        for name in args.scenarios:
+            kind, function = SCENARIOS[name]
+            for size in args.sizes:
+                result = run_scenario(function, simulators[kind], size, args.limit)
+                print(f"{name:<22} {result['devices']:>7} {result['devices_per_second']:>10.1f} {result['p50_ms']:>9.1f} "
+                      f"{result['p99_ms']:>9.1f} {result['peak_mb']:>8.1f} {result['errors']:>7}")
+    finally:
+        for simulator in simulators.values():
+            simulator.stop()
@@ -0,0 +1,161 @@
+# One parser of Arista "show ip bgp summary" output for all bgp scripts(bgp_tshoot.py, inactive_peers.py, find_ip.py).
+# Arista uses below type of "show ip bgp summary" command output:
+# Description              Neighbor         V  AS           MsgRcvd   MsgSent  InQ OutQ  Up/Down State   PfxRcd PfxAcc
+# BGP-PEER                 12.34.56.78      4  12345              0         0    0    0   10d00h Active
+# If the header line is present, rows are split by the "Neighbor" column offset without any regex.
+# Otherwise(for example "show ip bgp summary | in 12.34.56.78" output) the neighbor column is found with one precompiled regex per line.
+# SummaryParser does the same for lines which are fed one by one while the output is being received(see capture.py).
+# Usage:
+# for peer in parse_bgp_summary(output):
+#     print(peer.ip, peer.state, peer.uptime_seconds)
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from timing import timed
+import re
+import time
+
+NEIGHBOR_REGEX = re.compile(r'(?:^|\s)(\d{1,3}(?:\.\d{1,3}){3}|[0-9A-Fa-f]*:[0-9A-Fa-f:.]+)\s+\d\s')
+UPTIME_PART_REGEX = re.compile(r'(\d+)([ywdhms])')
+UPTIME_UNITS = {"y": 31536000, "w": 604800, "d": 86400, "h": 3600, "m": 60, "s": 1}
+
+def uptime_to_seconds(uptime):
+    '''
+    Allows to convert Arista Up/Down value("00:12:34", "10d00h", "5w2d", "1y10w") to seconds.
+    None is returned for values without time("never").
+    '''
+    if ":" in uptime:
+        seconds = 0
+        for part in uptime.split(":"):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    parts = UPTIME_PART_REGEX.findall(uptime)
+    if not parts:
+        return None
+    return sum(int(value) * UPTIME_UNITS[unit] for value, unit in parts)
+
+def seconds_to_uptime(seconds):
+    '''
+    Allows to convert seconds to Arista Up/Down format: "00:12:34" for less than one day, "10d00h" for less than one week, "5w2d" for more.
+    '''
+    seconds = int(seconds)
+    if seconds < 86400:
+        return f"{seconds // 3600:02}:{seconds // 60 % 60:02}:{seconds % 60:02}"
+    if seconds < 604800:
+        return f"{seconds // 86400}d{seconds // 3600 % 24:02}h"
+    return f"{seconds // 604800}w{seconds // 86400 % 7}d"
+
+class BgpPeer:
+    '''
+    One row of "show ip bgp summary" output. Prefix counters are None if the row doesn't have them(for example for Active/Idle peers).
+    '''
+    __slots__ = ("description", "ip", "version", "asn", "msg_rcvd", "msg_sent", "in_queue", "out_queue",
+                 "uptime", "uptime_seconds", "state", "pfx_rcd", "pfx_acc")
+
+    def __init__(self, description, ip, version, asn, msg_rcvd, msg_sent, in_queue, out_queue, uptime, state,
+                 pfx_rcd = None, pfx_acc = None, uptime_seconds = None):
+        self.description = description
+        self.ip = ip
+        self.version = version
+        self.asn = asn
+        self.msg_rcvd = msg_rcvd
+        self.msg_sent = msg_sent
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.uptime = uptime
+        self.uptime_seconds = uptime_to_seconds(uptime) if uptime_seconds is None else uptime_seconds
+        self.state = state
+        self.pfx_rcd = pfx_rcd
+        self.pfx_acc = pfx_acc
+
+    def __repr__(self):
+        return f"BgpPeer(ip={self.ip!r}, asn={self.asn!r}, state={self.state!r}, uptime={self.uptime!r})"
+
+    def as_dict(self):
+        '''
+        Allows to get the same dictionary as the old regex based parsers returned.
+        '''
+        return {"description": self.description, "ip": self.ip, "as": self.asn, "uptime": self.uptime, "state": self.state}
+
+def make_peer(description, fields):
+    '''
+    Allows to make BgpPeer from the description and a list of the next columns values(Neighbor, V, AS, ..., State, PfxRcd, PfxAcc).
+    None is returned if fields don't look like a peer row.
+    '''
+    if len(fields) < 9 or not fields[1].isdigit():
+        return None
+    try:
+        counters = [int(value) for value in fields[3:7]]
+        prefixes = [int(value) for value in fields[9:11]]
+    except ValueError:
+        return None
+    prefixes += [None] * (2 - len(prefixes))
+    return BgpPeer(description, fields[0], int(fields[1]), fields[2], *counters, fields[7], fields[8], *prefixes)
+
+class SummaryParser:
+    '''
+    Incremental parser: lines are fed one by one as soon as they are received(see capture.py), peers are collected in peers list.
+    Variables:
+    neighbor_column - offset of the "Neighbor" column from the header line, None until the header is received.
+    keep - function which makes the value kept in peers from BgpPeer, for example lambda peer: peer.ip.
+    '''
+    def __init__(self, keep = None):
+        self.neighbor_column = None
+        self.keep = keep
+        self.peers = []
+
+    def parse_line(self, line):
+        '''
+        Allows to get BgpPeer from one line or None if the line is not a peer row.
+        '''
+        if self.neighbor_column is None and "Neighbor" in line and "Up/Down" in line:
+            self.neighbor_column = line.index("Neighbor")
+            return None
+        if self.neighbor_column is not None:
+            peer = make_peer(line[:self.neighbor_column].strip(), line[self.neighbor_column:].split())
+            if peer is not None:
+                return peer
+        # Without header or if the description is longer than its column, the neighbor column is found with the regex.
+        match = NEIGHBOR_REGEX.search(line)
+        if not match:
+            return None
+        return make_peer(line[:match.start(1)].strip(), line[match.start(1):].split())
+
+    def feed(self, line):
+        peer = self.parse_line(line)
+        if peer is not None:
+            self.peers.append(peer if self.keep is None else self.keep(peer))
+
+def iter_peers(lines):
+    '''
+    Allows to parse "show ip bgp summary" output line by line and yield BgpPeer for every peer row.
+    lines can be any iterable of strings, so the output doesn't have to be in memory as one string.
+    '''
+    parser = SummaryParser()
+    for line in lines:
+        peer = parser.parse_line(line)
+        if peer is not None:
+            yield peer
+
+@timed("parse")
+def parse_bgp_summary(output):
+    '''
+    Allows to parse the whole "show ip bgp summary" output and return a list of BgpPeer.
+    '''
+    return list(iter_peers(output.splitlines()))
+
+def peers_from_json(data, vrf = "default", now = None):
+    '''
+    Allows to make a list of BgpPeer from eAPI JSON output of "show ip bgp summary".
+    eAPI returns upDownTime as a timestamp of the last state change, it is converted to seconds and to the usual Up/Down format.
+    '''
+    now = time.time() if now is None else now
+    peers = []
+    for ip, values in data.get("vrfs", {}).get(vrf, {}).get("peers", {}).items():
+        uptime_seconds = max(int(now - values.get("upDownTime", now)), 0)
+        peers.append(BgpPeer(values.get("description", ""), ip, values.get("version", 4), str(values.get("asn", "")),
+                             values.get("msgReceived", 0), values.get("msgSent", 0), values.get("inMsgQueue", 0), values.get("outMsgQueue", 0),
+                             seconds_to_uptime(uptime_seconds), values.get("peerState", ""),
+                             values.get("prefixReceived"), values.get("prefixAccepted"), uptime_seconds = uptime_seconds))
+    return peers
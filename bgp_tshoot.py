@@ -9,67 +9,220 @@
 # For convenience, before execution script will ask an ip-addresses of the switch and an ip-address of the bgp-peer, so there is no need to go to .py file and specify this values every time.
 # I intentionally made a dedicated function for each command to divide outputs via dashes, I realize that this is not so elegant decision.
 # This is just an example and of course some other things can be checked as well.
+# When many sessions are down at once, there is a non-interactive mode: ./bgp_tshoot.py --feed alerts.txt(or "--feed -" to read from stdin).
+# Every line of the feed is "<device> <bgp_neighbor>" or a JSON object {"device": ..., "peer": ...}.
+# All checks for all pairs run concurrently(several sessions per device), each result is printed as soon as it is ready
+# and tcpdump lines are printed as soon as packets are captured.
+# With --log-store option(see log_store.py) only log lines newer than the previous run are read from the device and kept locally,
+# the log check prints the history of the peer from the local store. ./bgp_tshoot.py --history 12.34.56.78 prints it without connecting to devices.
+# For devices with "transport: eapi"(see eapi.py) the bgp check takes the peer from JSON output instead of parsing the text.
 
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from netmiko import ConnectHandler
+from bgp_parser import parse_bgp_summary
+from eapi import EapiConnection, bgp_peers
+from session_pool import SessionPool
+from log_store import LogStore
+from capture import stream_command
 from pprint import pprint
-import re
+import argparse
+import json
+import sys
+import threading
 
-device = input('Enter device ip-address or hostname: ')
-bgp_neighbor = input('Enter bgp_neighbor ip-address: ')
+CHECKS = {
+    "bgp": "show ip bgp summary | in {}",
+    "log": "show logging | in {}",
+    "ping": "ping {}",
+}
+TCP_DUMP_COMMAND = "tcpdump packet-count 20 filter port 179 and host {}"
+
+def make_device(ip):
+    '''
+    Allows to make a set of settings for ssh connection to the switch.
+    '''
+    return {
+        "device_type": "arista_eos",
+        "ip": ip,
+        "username": "username",
+        "password": "password",
+    }
 
 def connect(device):
-    ‘’’
+    '''
     Allows to log in to switch
-    ‘’’
+    '''
     ssh = ConnectHandler(**device)
     return ssh
 
-def parse_bgp(command):
-    ‘’’
+def parse_bgp(ssh, command):
+    '''
     Allows to gather and parse some bgp summary information
     Arista uses below type of "show ip bgp summary" command output:
     Description              Neighbor         V  AS           MsgRcvd   MsgSent  InQ OutQ  Up/Down State   PfxRcd PfxAcc
     BGP-PEER                 12.34.56.78      4  12345              0         0    0    0   10d00h Active         
-    ‘’’
-    result = []
-    regex = (r'(?P<description>.*?)\s+(?P<ip>\S+)\s+\d\s+(?P<as>\S+)(?:\s+\d+){4}\s+(?P<uptime>\S+)\s+(?P<state>\S+)')
-    output = ssh.send_command(command)
-    match = re.search(regex,output)
-    result = match.groupdict()
+    The output is parsed with bgp_parser, the first peer is returned as a dictionary(empty if there is no such peer).
+    eAPI sessions return peers from JSON output, the "| in" filter is applied by eapi.bgp_peers.
+    '''
+    if isinstance(ssh, EapiConnection):
+        peers = bgp_peers(ssh, command)[0]
+    else:
+        output = ssh.send_command(command)
+        peers = parse_bgp_summary(output)
+    result = peers[0].as_dict() if peers else {}
     return result
 
-def log_bgp(sh_log_command):
+def log_bgp(ssh, sh_log_command):
     log_output = ssh.send_command(sh_log_command)
     return log_output
 
-def ping_check(ping_command):
+def log_history(ssh, store, device, bgp_neighbor):
+    '''
+    Allows to add new log lines of the device to store(log_store.LogStore) and to get all stored lines of the bgp-peer.
+    '''
+    store.fetch(device, ssh)
+    return "\n".join(line for name, timestamp, message_type, line in store.history(bgp_neighbor, device = device))
+
+def ping_check(ssh, ping_command):
     ping_output = ssh.send_command(ping_command)
     return ping_output
 
-def tcp_dump(tcp_dump_command):
-    dump_output = ssh.send_command_timing(tcp_dump_command)
+def stream_tcp_dump(ssh, tcp_dump_command, timeout = 30):
+    '''
+    Allows to get tcpdump output line by line as soon as packets are captured.
+    If tcpdump isn't finished in timeout seconds(for example there are no packets at all), it is stopped with Ctrl+C.
+    '''
+    for chunk in stream_command(ssh, tcp_dump_command, read_timeout = timeout, interrupt = True):
+        for line in chunk.split("\n"):
+            line = line.rstrip("\r")
+            if line and tcp_dump_command not in line:
+                yield line
+
+def tcp_dump(ssh, tcp_dump_command, timeout = 30):
+    dump_output = "\n".join(stream_tcp_dump(ssh, tcp_dump_command, timeout))
     return dump_output
 
+def run_check(device, bgp_neighbor, check, pool, log_store = None):
+    '''
+    Allows to run one check(see CHECKS) on its own session from the pool. If log_store is given, the log check uses it(see log_history).
+    '''
+    functions = {"bgp": parse_bgp, "log": log_bgp, "ping": ping_check}
+    with pool.session(device) as ssh:
+        if check == "log" and log_store is not None:
+            return log_history(ssh, log_store, device, bgp_neighbor)
+        return functions[check](ssh, CHECKS[check].format(bgp_neighbor))
+
+def run_tcp_dump(device, bgp_neighbor, pool, report, timeout):
+    '''
+    Allows to run tcpdump on its own session from the pool and report every captured line immediately.
+    '''
+    with pool.session(device) as ssh:
+        for line in stream_tcp_dump(ssh, TCP_DUMP_COMMAND.format(bgp_neighbor), timeout):
+            report(device["ip"], bgp_neighbor, "tcpdump", line)
+
+def run_diagnostics(pairs, report, limit = 20, sessions_per_device = 4, tcp_dump_timeout = 30, log_store = None, tcp_dumps_per_device = 1):
+    '''
+    Allows to run all checks for a list of (device, bgp_neighbor) pairs concurrently.
+    report(device, bgp_neighbor, check, output) is called as soon as each check is finished, for tcpdump - for every captured line.
+    Calls of report are serialized, so it can simply print. If a check fails, output is an "ERROR: ..." string.
+    tcpdump of a down peer captures nothing and holds its session for the whole tcp_dump_timeout, so tcpdumps have their own sessions
+    and threads: they never wait for fast checks and fast checks never wait for them.
+    Variables:
+    limit - maximum number of fast checks(bgp, log, ping) running at once and, separately, of tcpdumps running at once.
+    sessions_per_device - maximum number of simultaneous sessions to one device, tcp_dumps_per_device of them are reserved for tcpdump.
+    log_store - log_store.LogStore for the log check, by default "show logging | in <peer>" is used.
+    '''
+    lock = threading.Lock()
+    def locked_report(*args):
+        with lock:
+            report(*args)
+    futures = {}
+    check_sessions = max(sessions_per_device - tcp_dumps_per_device, 1)
+    with SessionPool(max_per_device = check_sessions) as pool, SessionPool(max_per_device = tcp_dumps_per_device) as tcp_dump_pool, \
+         ThreadPoolExecutor(max_workers = limit) as executor, ThreadPoolExecutor(max_workers = limit) as tcp_dump_executor:
+        pairs = [(device_ip, bgp_neighbor, make_device(device_ip)) for device_ip, bgp_neighbor in pairs]
+        # Fast checks of all pairs are submitted first, so they are reported as soon as possible.
+        for device_ip, bgp_neighbor, device in pairs:
+            for check in CHECKS:
+                futures[executor.submit(run_check, device, bgp_neighbor, check, pool, log_store)] = (device_ip, bgp_neighbor, check)
+        for device_ip, bgp_neighbor, device in pairs:
+            future = tcp_dump_executor.submit(run_tcp_dump, device, bgp_neighbor, tcp_dump_pool, locked_report, tcp_dump_timeout)
+            futures[future] = (device_ip, bgp_neighbor, "tcpdump")
+        for future in as_completed(futures):
+            device_ip, bgp_neighbor, check = futures[future]
+            try:
+                output = future.result()
+            except Exception as error:
+                locked_report(device_ip, bgp_neighbor, check, f"ERROR: {error!r}")
+                continue
+            if check != "tcpdump":
+                locked_report(device_ip, bgp_neighbor, check, output)
+
+def read_alerts(alert_file):
+    '''
+    Allows to read (device, bgp_neighbor) pairs from the alert feed: "<device> <bgp_neighbor>" or {"device": ..., "peer": ...} per line.
+    '''
+    for line in alert_file:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            alert = json.loads(line)
+            yield alert["device"], alert["peer"]
+        else:
+            device, bgp_neighbor = line.split()[:2]
+            yield device, bgp_neighbor
+
+def print_report(device, bgp_neighbor, check, output):
+    if check == "tcpdump":
+        print(f"{device} {bgp_neighbor} tcpdump: {output}")
+        return
+    pprint('-'*200)
+    print(f"{device} {bgp_neighbor} {check}:")
+    if isinstance(output, str):
+        print(output)
+    else:
+        pprint(output, sort_dicts=False)
+
 if __name__ == "__main__":
-    device = {
-        "device_type": "arista_eos",
-        "ip": device,
-        "username": "username",
-        "password": "password",
-    }
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--feed", help="file with (device, bgp_neighbor) pairs, - for stdin")
+    parser.add_argument("--tcpdump-timeout", type=int, default=30)
+    parser.add_argument("--log-store", nargs="?", const="log_store.sqlite", help="keep log lines in the local store(log_store.sqlite by default)")
+    parser.add_argument("--history", metavar="BGP_NEIGHBOR", help="print stored log lines of the peer from all devices and exit")
+    parser.add_argument("--type", help="only log lines of this message type with --history, for example %%BGP-5-PEER_CLEAR")
+    args = parser.parse_args()
+    log_store = LogStore(args.log_store or "log_store.sqlite") if args.log_store or args.history else None
+    if args.history:
+        for name, timestamp, message_type, line in log_store.history(args.history, message_type = args.type):
+            print(line)
+        sys.exit()
+    if args.feed:
+        alert_file = sys.stdin if args.feed == "-" else open(args.feed)
+        with alert_file:
+            pairs = list(read_alerts(alert_file))
+        run_diagnostics(pairs, print_report, tcp_dump_timeout = args.tcpdump_timeout, log_store = log_store)
+        sys.exit()
+
+    device = input('Enter device ip-address or hostname: ')
+    bgp_neighbor = input('Enter bgp_neighbor ip-address: ')
+    device = make_device(device)
 
     ssh = connect(device)
     pprint('-'*200)
-    pprint(parse_bgp("show ip bgp summary | in " '{}'.format(bgp_neighbor)),sort_dicts=False)
+    pprint(parse_bgp(ssh, "show ip bgp summary | in " '{}'.format(bgp_neighbor)),sort_dicts=False)
     pprint('-'*200)
-    print(log_bgp("show logging | in " '{}'.format(bgp_neighbor)))
+    if log_store is not None:
+        print(log_history(ssh, log_store, device, bgp_neighbor))
+    else:
+        print(log_bgp(ssh, "show logging | in " '{}'.format(bgp_neighbor)))
     pprint('-'*200)
-    pprint(ping_check("ping " '{}'.format(bgp_neighbor)))
+    pprint(ping_check(ssh, "ping " '{}'.format(bgp_neighbor)))
     pprint('-'*200)
-    print(tcp_dump("tcpdump packet-count 20 filter port 179 and host " '{}'.format(bgp_neighbor)))
+    print(tcp_dump(ssh, "tcpdump packet-count 20 filter port 179 and host " '{}'.format(bgp_neighbor), timeout = args.tcpdump_timeout))
     pprint('-'*200)
     
     
@@ -81,9 +234,9 @@ if __name__ == "__main__":
 # Enter device ip-address or hostname: test-switch
 # Enter bgp_neighbor ip-address: 12.34.56.78
 # '--------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------'
-# {'description': '  BGP-PEER ',
+# {'description': 'BGP-PEER',
 #  'ip': '12.34.56.78',
-#  'as': ‘12345’,
+#  'as': '12345',
 #  'uptime': '10d00h',
 #  'state': 'Active'}
 # '--------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------'
@@ -0,0 +1,158 @@
+# Streaming capture of command outputs, so the output of one command is never kept as one big string.
+# stream_command reads the output from the netmiko session chunk by chunk(without the command echo and the prompt at the end),
+# Capture splits chunks into lines and feeds every line to parsers as soon as it is received.
+# The raw text is kept only if it is needed(keep_raw): in memory below spill_threshold bytes, in a temporary file on disk above it.
+# The device and its hostname are kept in metadata instead of being added to the output text.
+# Usage:
+# parser = SummaryParser()
+# with open_session(device) as ssh:
+#     with capture_command(ssh, "show ip bgp summary", [parser.feed], keep_raw = False, hostname = ssh.find_prompt()[:-1]) as capture:
+#         print(capture.metadata, len(parser.peers))
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import tempfile
+import time
+import timing
+
+SPILL_THRESHOLD = 1 << 20
+
+def stream_command(ssh, command, read_timeout = 10, interrupt = False):
+    '''
+    Allows to send the command to the netmiko session and to get its output in chunks as soon as they are received.
+    Every chunk ends with a line break, the echo of the command and the prompt after the output are not returned.
+    If no data is received for read_timeout seconds, TimeoutError is raised, so long outputs which are still streaming are never cut.
+    With interrupt read_timeout is the whole duration of the command(for example tcpdump), after it the command is stopped with Ctrl+C.
+    Sessions without a channel(eapi.EapiConnection) return the whole output as one chunk.
+    '''
+    if not hasattr(ssh, "write_channel"):
+        output = ssh.send_command(command)
+        if output:
+            yield output if output.endswith("\n") else output + "\n"
+        return
+    prompts = (ssh.base_prompt + "#", ssh.base_prompt + ">")
+    ssh.write_channel(command + "\n")
+    deadline = time.monotonic() + read_timeout
+    interrupted = False
+    echo = True
+    buffer = ""
+    while True:
+        chunk = ssh.read_channel()
+        if chunk:
+            if not interrupt:
+                deadline = time.monotonic() + read_timeout
+            buffer += chunk
+            if echo and "\n" in buffer:
+                line, _, buffer = buffer.partition("\n")
+                echo = False
+                if command.strip() not in line:
+                    buffer = line + "\n" + buffer
+            end = buffer.rfind("\n") + 1
+            if end and not echo:
+                yield buffer[:end]
+                buffer = buffer[end:]
+            if not echo and buffer.rstrip().endswith(prompts):
+                return
+        elif time.monotonic() > deadline:
+            if not interrupt:
+                raise TimeoutError(f"no data is received in {read_timeout} seconds after {command!r}")
+            if interrupted:
+                return
+            ssh.write_channel("\x03")
+            interrupted = True
+            deadline = time.monotonic() + 5
+        else:
+            time.sleep(0.01)
+
+class Capture:
+    '''
+    Variables:
+    parsers - functions which are called with every line(without the line break) of the output.
+    metadata - dictionary with bytes, lines and spilled keys and any keys given to the constructor(for example device and hostname).
+    raw - temporary file with the raw output, in memory up to spill_threshold bytes, on disk above it(None if keep_raw is False).
+    parse_seconds - time spent in parsers, it is measured only if timing is installed(see timing.py).
+    '''
+    def __init__(self, parsers = (), spill_threshold = SPILL_THRESHOLD, keep_raw = True, **metadata):
+        self.parsers = list(parsers)
+        self.spill_threshold = spill_threshold
+        self.raw = tempfile.SpooledTemporaryFile(max_size = spill_threshold, mode = "w+") if keep_raw else None
+        self.metadata = dict(metadata, bytes = 0, lines = 0, spilled = False)
+        self.tail = ""
+        self.parse_seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def feed(self, chunk):
+        '''
+        Allows to add the next chunk of the output: complete lines are passed to parsers, the rest is kept until the next chunk.
+        '''
+        self.metadata["bytes"] += len(chunk)
+        if self.raw is not None:
+            self.raw.write(chunk)
+            self.metadata["spilled"] = self.metadata["bytes"] > self.spill_threshold
+        *lines, self.tail = (self.tail + chunk).split("\n")
+        for line in lines:
+            self._line(line)
+
+    def _line(self, line):
+        line = line.rstrip("\r")
+        self.metadata["lines"] += 1
+        if timing.recorder is None:
+            for parser in self.parsers:
+                parser(line)
+            return
+        start = time.perf_counter()
+        for parser in self.parsers:
+            parser(line)
+        self.parse_seconds += time.perf_counter() - start
+
+    def finish(self):
+        '''
+        Allows to pass the last line without a line break to parsers.
+        '''
+        if self.tail:
+            self._line(self.tail)
+            self.tail = ""
+        return self
+
+    def lines(self):
+        '''
+        Allows to read the raw output again line by line, for example to save it, without loading it into memory at once.
+        '''
+        self.raw.seek(0)
+        for line in self.raw:
+            yield line.rstrip("\r\n")
+
+    def text(self):
+        self.raw.seek(0)
+        return self.raw.read()
+
+    def close(self):
+        if self.raw is not None:
+            self.raw.close()
+
+def capture_command(ssh, command, parsers = (), spill_threshold = SPILL_THRESHOLD, keep_raw = True, read_timeout = 10, **metadata):
+    '''
+    Allows to run the command and to feed its output to parsers while it is received. Capture is returned, it should be closed
+    when the raw output is not needed anymore. If timing is installed(see timing.py), the time of parsers is recorded as "parse" phase
+    and the rest as "capture" phase, so the command time is not mixed with the parse time.
+    '''
+    capture = Capture(parsers, spill_threshold, keep_raw, command = command, **metadata)
+    start = time.perf_counter()
+    try:
+        for chunk in stream_command(ssh, command, read_timeout):
+            capture.feed(chunk)
+        capture.finish()
+    except BaseException:
+        capture.close()
+        raise
+    if timing.recorder is not None:
+        timing.recorder.record(metadata.get("device"), "capture", time.perf_counter() - start - capture.parse_seconds, capture.metadata["bytes"])
+        if capture.parsers:
+            timing.recorder.record(metadata.get("device"), "parse", capture.parse_seconds, capture.metadata["bytes"])
+    return capture
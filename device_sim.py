@@ -0,0 +1,484 @@
+# Local device simulator: an in-process ssh server(paramiko server API) which emulates Arista EOS CLI or CentOS shell,
+# so the scripts can be measured without real switches and servers.
+# One simulator emulates any number of devices: the device hostname is the username used to log in, for example "leaf-0001".
+# EOS commands: show ip bgp summary, show interfaces ... description, show logging, show hostname, ping, tcpdump, configure/interface/description/end
+# and "| include"/"| exclude"/"| begin" filters("sh" is accepted for "show"). CentOS commands: sudo su, cd, cat of the file with VERSION string
+# and(on exec channel) the command of show_servers_versions.py which prints VERSION of every running docker container.
+# latency and jitter(seconds) are added to every command, failure_rate is a share of connections which are dropped before ssh handshake,
+# peers/log_lines/file_lines/containers set the size of outputs.
+# Usage:
+# with DeviceSimulator(kind = "eos", latency = 0.05, peers = 1000) as simulator:
+#     device = simulator.device(1)  # {'device_type': 'arista_eos', 'host': '127.0.0.1', 'port': ..., 'username': 'leaf-0001', ...}
+# EapiSimulator is a local HTTP stand-in of Arista eAPI(runCmds on /command-api) with the same switches and outputs, the hostname is the username
+# of Basic authentication. Text format returns the same outputs as the ssh simulator, JSON format is supported for show ip bgp summary and show hostname:
+# with EapiSimulator(latency = 0.05) as simulator:
+#     device = simulator.device(1)  # {..., 'transport': 'eapi', 'protocol': 'http'}, see eapi.py
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import base64
+import json
+import paramiko
+import random
+import socket
+import threading
+import time
+
+class SimInterface(paramiko.ServerInterface):
+    '''
+    Accepts any credentials and remembers which channel requested a shell and which an exec command.
+    '''
+    def __init__(self):
+        self.username = None
+        self.requests = {}
+        self.condition = threading.Condition()
+
+    def get_allowed_auths(self, username):
+        return "password,publickey"
+
+    def check_auth_password(self, username, password):
+        self.username = username
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_auth_publickey(self, username, key):
+        self.username = username
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED_OPEN_REQUEST
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def _request(self, channel, request):
+        with self.condition:
+            self.requests[channel.get_id()] = request
+            self.condition.notify_all()
+        return True
+
+    def check_channel_shell_request(self, channel):
+        return self._request(channel, ("shell", None))
+
+    def check_channel_exec_request(self, channel, command):
+        return self._request(channel, ("exec", command.decode()))
+
+    def wait_request(self, channel, timeout = 10):
+        with self.condition:
+            self.condition.wait_for(lambda: channel.get_id() in self.requests, timeout)
+            return self.requests.pop(channel.get_id(), None)
+
+def apply_filters(output, filters):
+    '''
+    Allows to emulate "| include", "| exclude" and "| begin" filters.
+    '''
+    lines = output.splitlines()
+    for pipe in filters:
+        keyword, _, value = pipe.strip().partition(" ")
+        if keyword in ("in", "inc", "include"):
+            lines = [line for line in lines if value in line]
+        elif keyword in ("ex", "exc", "exclude"):
+            lines = [line for line in lines if value not in line]
+        elif keyword in ("beg", "begin"):
+            for position, line in enumerate(lines):
+                if value in line:
+                    lines = lines[position:]
+                    break
+            else:
+                lines = []
+    return "\n".join(lines)
+
+class DeviceSimulator:
+    '''
+    Variables:
+    kind - "eos" for Arista switches or "centos" for servers.
+    versions - firmware versions which are spread between simulated servers.
+    '''
+    versions = ("1.2.02", "1.2.03", "1.2.04")
+
+    def __init__(self, kind = "eos", host = "127.0.0.1", port = 0, latency = 0.0, jitter = 0.0, failure_rate = 0.0,
+                 peers = 20, log_lines = 50, file_lines = 30, containers = 3, seed = None):
+        self.kind = kind
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.peers = peers
+        self.log_lines = log_lines
+        self.file_lines = file_lines
+        self.containers = containers
+        self.log_start = int(time.time())
+        self.random = random.Random(seed)
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self._socket = None
+        self._running = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen(1024)
+        self.port = self._socket.getsockname()[1]
+        self._running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._socket is not None:
+            self._socket.close()
+
+    def device(self, number):
+        '''
+        Allows to get connection parameters of the simulated device number(netmiko style for switches).
+        '''
+        if self.kind == "eos":
+            return {"device_type": "arista_eos", "host": self.host, "port": self.port, "username": f"leaf-{number:04}", "password": "sim"}
+        return {"hostname": self.host, "port": self.port, "username": f"srv-{number:04}"}
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                client, address = self._socket.accept()
+            except OSError:
+                break
+            if self.random.random() < self.failure_rate:
+                client.close()
+                continue
+            threading.Thread(target=self._handle, args=(client,), daemon=True).start()
+
+    def _handle(self, client):
+        transport = paramiko.Transport(client)
+        transport.add_server_key(self.host_key)
+        interface = SimInterface()
+        try:
+            transport.start_server(server=interface)
+        except (paramiko.SSHException, EOFError):
+            return
+        while transport.is_active():
+            channel = transport.accept(1)
+            if channel is not None:
+                threading.Thread(target=self._serve_channel, args=(interface, channel), daemon=True).start()
+
+    def _serve_channel(self, interface, channel):
+        request = interface.wait_request(channel)
+        try:
+            if request is None:
+                return
+            kind, command = request
+            if kind == "exec":
+                self._exec(channel, interface.username, command)
+            elif self.kind == "eos":
+                self._eos_shell(channel, interface.username)
+            else:
+                self._centos_shell(channel, interface.username)
+        except (OSError, EOFError, paramiko.SSHException):
+            pass
+        finally:
+            try:
+                channel.close()
+            except (OSError, EOFError, paramiko.SSHException):
+                pass
+
+    def _delay(self):
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _read_lines(self, channel):
+        '''
+        Allows to read commands from the channel line by line, Ctrl+C is returned as a separate "\x03" line.
+        NUL bytes(netmiko is_alive() sends one) are dropped, as EOS does.
+        '''
+        buffer = ""
+        while True:
+            data = channel.recv(4096)
+            if not data:
+                return
+            for char in data.decode(errors="ignore"):
+                if char == "\n":
+                    yield buffer
+                    buffer = ""
+                elif char == "\x03":
+                    buffer = ""
+                    yield "\x03"
+                elif char not in "\r\x00":
+                    buffer += char
+
+    # Arista EOS emulation.
+
+    def bgp_peers(self, hostname):
+        '''
+        Allows to get (description, ip, as, received, sent, uptime in seconds, state, received prefixes, accepted prefixes) of every peer of the switch.
+        '''
+        generator = random.Random(hostname)
+        for number in range(self.peers):
+            ip = f"10.{number >> 16 & 255}.{number >> 8 & 255}.{number & 255}"
+            if generator.random() < 0.8:
+                days, hours, state, prefixes = generator.randint(0, 6), generator.randint(0, 23), "Estab", (generator.randint(0, 9000), generator.randint(0, 9000))
+            else:
+                days, hours, state, prefixes = generator.randint(1, 30), generator.randint(0, 23), generator.choice(("Active", "Idle(Admin)")), (None, None)
+            yield (f"PEER-{number}", ip, 65001 + number, generator.randint(0, 10**6), generator.randint(0, 10**6), days * 86400 + hours * 3600, state, *prefixes)
+
+    def bgp_summary(self, hostname):
+        rows = ["BGP summary information for VRF default",
+                "Router identifier 10.0.0.1, local AS number 65000",
+                "Neighbor Status Codes: m - Under maintenance",
+                "  Description              Neighbor         V  AS           MsgRcvd   MsgSent  InQ OutQ  Up/Down State   PfxRcd PfxAcc"]
+        for description, ip, asn, received, sent, uptime, state, prefix_received, prefix_accepted in self.bgp_peers(hostname):
+            prefixes = f"{prefix_received:>6} {prefix_accepted:>6}" if prefix_received is not None else ""
+            rows.append(f"  {description:<24} {ip:<16} 4  {asn:<12} {received:>8} "
+                        f"{sent:>9} {0:>4} {0:>4} {f'{uptime // 86400}d{uptime % 86400 // 3600:02}h':>8} {state:<7} {prefixes}")
+        return "\n".join(rows)
+
+    def bgp_summary_json(self, hostname):
+        '''
+        Allows to get eAPI JSON output of "show ip bgp summary": upDownTime is the timestamp of the last state change.
+        '''
+        peers = {}
+        now = time.time()
+        for description, ip, asn, received, sent, uptime, state, prefix_received, prefix_accepted in self.bgp_peers(hostname):
+            peers[ip] = {"description": description, "version": 4, "asn": str(asn), "msgReceived": received, "msgSent": sent,
+                         "inMsgQueue": 0, "outMsgQueue": 0, "upDownTime": now - uptime,
+                         "peerState": "Established" if state == "Estab" else state.partition("(")[0]}
+            if prefix_received is not None:
+                peers[ip].update(prefixReceived = prefix_received, prefixAccepted = prefix_accepted)
+        return {"vrfs": {"default": {"routerId": "10.0.0.1", "asn": "65000", "peers": peers}}}
+
+    def interfaces_description(self, hostname):
+        rows = ["Interface                      Status         Protocol           Description"]
+        for number in range(1, 5):
+            rows.append(f"Po{number:<29}up             up                 ISP{number} {hostname}")
+        return "\n".join(rows)
+
+    def logging(self, hostname, seconds = None):
+        '''
+        Allows to get log_lines lines, one per second, the last one was logged when the simulator was created.
+        With seconds only lines of the last seconds seconds are returned(as "show logging last N seconds" does).
+        '''
+        rows = []
+        start = self.log_start - self.log_lines
+        for number in range(self.log_lines):
+            if seconds is not None and start + number < time.time() - seconds:
+                continue
+            timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(start + number))
+            peer = f"10.0.{number >> 8 & 255}.{number & 255}"
+            rows.append(f"{timestamp}.000000+00:00 {hostname} ConfigAgent: %BGP-5-PEER_CLEAR: BGP peering for neighbor {peer} (vrf default) "
+                        f"was hard reset by admin on vty7 (192.168.222.222)")
+        return "\n".join(rows)
+
+    def eos_command(self, hostname, line, mode):
+        '''
+        Allows to get an output of one EOS command and the new configuration mode.
+        '''
+        if line.startswith("sh "):
+            line = "show " + line[3:]
+        command, *filters = line.split(" | ")
+        words = command.split()
+        if words[:2] == ["terminal", "width"]:
+            return f"Width set to {words[-1]} columns.", mode
+        if words[:2] == ["terminal", "length"]:
+            return "Pagination disabled.", mode
+        if not words or words[0] in ("enable", "description", "no"):
+            return "", mode
+        if words[0] in ("configure", "conf"):
+            return "", "(config)"
+        if words[0] == "interface" and mode:
+            return "", f"(config-if-{words[1]})"
+        if words[0] == "end":
+            return "", ""
+        if words[0] == "exit":
+            return "", "(config)" if mode.startswith("(config-") else ""
+        if command.startswith("show ip bgp summary"):
+            output = self.bgp_summary(hostname)
+        elif command.startswith("show interfaces") and command.endswith("description"):
+            output = self.interfaces_description(hostname)
+        elif command.startswith("show logging"):
+            output = self.logging(hostname, int(words[3]) if words[2:3] == ["last"] and words[4:5] == ["seconds"] else None)
+        elif command == "show hostname":
+            output = f"Hostname: {hostname}\nFQDN:     {hostname}"
+        elif words[0] == "ping":
+            output = (f"PING {words[-1]} ({words[-1]}) 72(100) bytes of data.\n"
+                      + "".join(f"80 bytes from {words[-1]}: icmp_seq={number} ttl=62 time=0.1 ms\n" for number in range(1, 6))
+                      + f"\n--- {words[-1]} ping statistics ---\n5 packets transmitted, 5 received, 0% packet loss, time 0ms")
+        else:
+            output = "% Invalid input"
+        return apply_filters(output, filters), mode
+
+    def _tcp_dump(self, channel, count):
+        channel.sendall("tcpdump: verbose output suppressed, use -v or -vv for full protocol decode\r\n")
+        for number in range(count):
+            if channel.recv_ready() and b"\x03" in channel.recv(1024):
+                channel.sendall("^C\r\n")
+                return
+            self._delay()
+            channel.sendall(f"00:00:{number:02}.543715 ab:cd:ef:12:34:56 > 12:34:56:78:90:ab, ethertype IPv4, length 70: "
+                         f"12.34.56.78.43210 > 10.10.10.10.bgp: Flags [.], ack {number}, length 0\r\n")
+
+    def _eos_shell(self, channel, hostname):
+        mode = ""
+        channel.sendall(f"\r\n{hostname}#")
+        for line in self._read_lines(channel):
+            if line == "\x03":
+                channel.sendall(f"^C\r\n{hostname}{mode}#")
+                continue
+            channel.sendall(line + "\r\n")
+            self._delay()
+            if line.startswith("tcpdump"):
+                words = line.split()
+                count = int(words[words.index("packet-count") + 1]) if "packet-count" in words else 20
+                self._tcp_dump(channel, count)
+                output = ""
+            else:
+                output, mode = self.eos_command(hostname, line, mode)
+            if output:
+                channel.sendall(output.replace("\n", "\r\n") + "\r\n")
+            channel.sendall(f"{hostname}{mode}#")
+
+    # CentOS emulation.
+
+    def version_file(self, hostname, container = 0):
+        rows = [f"PARAMETER_{number}=value-{number}" for number in range(self.file_lines)]
+        rows.insert(len(rows) // 2, f"VERSION={self.versions[(sum(hostname.encode()) + container) % len(self.versions)]}")
+        return "\n".join(rows)
+
+    def container_versions(self, hostname):
+        '''
+        Allows to get "<container> VERSION=..." line for every simulated container, the first container is not running the application.
+        '''
+        rows = [f"app-{number} VERSION={self.versions[(sum(hostname.encode()) + number) % len(self.versions)]}" for number in range(1, self.containers)]
+        return "\n".join(["sidecar-0 "] + rows)
+
+    def centos_command(self, hostname, line):
+        words = line.split()
+        if "docker ps" in line:
+            return self.container_versions(hostname)
+        if words and words[0] == "cat":
+            return self.version_file(hostname)
+        if not words or words[0] in ("cd", "exit"):
+            return ""
+        return f"bash: {words[0]}: command not found"
+
+    def _centos_shell(self, channel, hostname):
+        user = hostname
+        cwd = "~"
+        prompt = lambda: f"[{user}@{hostname} {cwd}]{'#' if user == 'root' else '$'} "
+        channel.sendall(f"Last login: Thu Jan  1 00:00:00 1970\r\n{prompt()}")
+        for line in self._read_lines(channel):
+            if line == "\x03":
+                channel.sendall(f"^C\r\n{prompt()}")
+                continue
+            channel.sendall(line + "\r\n")
+            self._delay()
+            if line.strip() == "sudo su":
+                user = "root"
+                output = ""
+            elif line.startswith("cd "):
+                cwd = line.split()[1].rstrip("/").rsplit("/", 1)[-1] or "/"
+                output = ""
+            else:
+                output = self.centos_command(hostname, line)
+            if output:
+                channel.sendall(output.replace("\n", "\r\n") + "\r\n")
+            channel.sendall(prompt())
+
+    def _exec(self, channel, hostname, command):
+        self._delay()
+        if self.kind == "eos":
+            output, mode = self.eos_command(hostname, command, "")
+            status = 0
+        else:
+            output = self.centos_command(hostname, command)
+            status = 127 if output.endswith("command not found") else 0
+        if output:
+            channel.sendall(output + "\n")
+        channel.send_exit_status(status)
+
+class EapiSimulator(DeviceSimulator):
+    '''
+    HTTP stand-in of eAPI for the simulated switches, see eapi.EapiConnection. Commands of one request are run in order,
+    the first failed command returns a JSON-RPC error for the whole request(as a switch does).
+    '''
+    def __init__(self, host = "127.0.0.1", port = 0, latency = 0.0, jitter = 0.0, peers = 20, log_lines = 50, seed = None):
+        super().__init__("eos", host, port, latency, jitter, peers = peers, log_lines = log_lines, seed = seed)
+        self._server = None
+
+    def start(self):
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                simulator._serve_request(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def device(self, number):
+        return dict(super().device(number), transport = "eapi", protocol = "http")
+
+    def eapi_command(self, hostname, command, format, mode = ""):
+        '''
+        Allows to get the result of one command({"output": ...} for text format, a dictionary for JSON format) and the new configuration mode,
+        so "configure" and "interface" commands of one request apply to the next ones. ValueError is raised for commands which the switch would reject.
+        '''
+        if command.startswith("sh "):
+            command = "show " + command[3:]
+        output, mode = self.eos_command(hostname, command, mode)
+        if output.startswith("% Invalid input"):
+            raise ValueError(f"Invalid input (at token 0: {command!r})")
+        if format == "text":
+            return {"output": output + "\n" if output else ""}, mode
+        if " | " in command:
+            raise ValueError(f"Command {command!r} with a filter can't be converted to JSON")
+        if command.startswith("show ip bgp summary"):
+            return self.bgp_summary_json(hostname), mode
+        if command == "show hostname":
+            return {"hostname": hostname, "fqdn": hostname}, mode
+        if not output:
+            return {}, mode
+        raise ValueError(f"Command {command!r} has no JSON output in the simulator, use text format")
+
+    def _serve_request(self, handler):
+        request = json.loads(handler.rfile.read(int(handler.headers.get("Content-Length", 0))))
+        credentials = handler.headers.get("Authorization", "").partition(" ")[2]
+        hostname = base64.b64decode(credentials).decode().partition(":")[0]
+        params = request.get("params", {})
+        self._delay()
+        result = []
+        mode = ""
+        try:
+            for command in params.get("cmds", []):
+                output, mode = self.eapi_command(hostname, command, params.get("format", "json"), mode)
+                result.append(output)
+            response = {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+        except ValueError as error:
+            response = {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": 1002, "message": str(error)}}
+        body = json.dumps(response).encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
@@ -0,0 +1,168 @@
+# Arista eAPI transport which can be used instead of netmiko screen-scraping.
+# Several commands are sent in one JSON-RPC "runCmds" request and JSON output is returned, so there is no text parsing on the collector.
+# EapiConnection has the same methods which the scripts use on netmiko connections(send_command, send_config_set, find_prompt, enable),
+# so it is enough to add "transport: eapi" to the device in yaml file(session_pool.connect chooses the transport):
+# - device_type: arista_eos
+#   ip: edge-switch-1
+#   username: <username>
+#   password: <password>
+#   transport: eapi
+# eAPI should be enabled on the switch("management api http-commands" / "no shutdown").
+# protocol and port keys can be added as well, for example to use a local HTTP stand-in instead of a real switch(device_sim.EapiSimulator).
+# The scripts send the show command together with "show hostname" in one request(see run_with_hostname and bgp_peers), so every device costs one round trip.
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from bgp_parser import peers_from_json
+import base64
+import http.client
+import itertools
+import json
+import re
+import ssl
+
+HOSTNAME_REGEX = re.compile(r'Hostname:\s*(\S+)')
+
+class EapiError(Exception):
+    '''
+    eAPI returned an error instead of commands output.
+    '''
+    def __init__(self, code, message, data = None):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.message = message
+        self.data = data
+
+class EapiConnection:
+    '''
+    Allows to run commands on one Arista switch via eAPI.
+    The HTTP connection is kept open between requests and reopened if it was closed by the switch.
+    '''
+    _ids = itertools.count(1)
+
+    def __init__(self, host = None, ip = None, username = None, password = "", port = None, protocol = "https", timeout = 60,
+                 verify = False, **kwargs):
+        self.host = host or ip
+        self.username = username
+        self.password = password
+        self.protocol = protocol
+        self.port = port or (443 if protocol == "https" else 80)
+        self.timeout = timeout
+        self.verify = verify
+        credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+        self._headers = {"Content-Type": "application/json", "Authorization": f"Basic {credentials}"}
+        self._http = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.disconnect()
+
+    def _connection(self):
+        if self._http is None:
+            if self.protocol == "https":
+                context = ssl.create_default_context() if self.verify else ssl._create_unverified_context()
+                self._http = http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=context)
+            else:
+                self._http = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return self._http
+
+    def _post(self, body):
+        for attempt in range(2):
+            http_connection = self._connection()
+            try:
+                http_connection.request("POST", "/command-api", body, self._headers)
+                response = http_connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, ConnectionError):
+                self.disconnect()
+                if attempt:
+                    raise
+                continue
+            if response.status != 200:
+                raise EapiError(response.status, response.reason)
+            return json.loads(data)
+
+    def run_cmds(self, commands, format = "json"):
+        '''
+        Allows to send a list of commands in one request and return a list of results(one per command).
+        With "json" format results are dictionaries, with "text" format - dictionaries with "output" key.
+        '''
+        request = {"jsonrpc": "2.0", "method": "runCmds", "params": {"version": 1, "cmds": list(commands), "format": format},
+                   "id": next(self._ids)}
+        response = self._post(json.dumps(request))
+        if "error" in response:
+            error = response["error"]
+            raise EapiError(error.get("code"), error.get("message"), error.get("data"))
+        return response["result"]
+
+    def send_command(self, command):
+        '''
+        The same as netmiko send_command: returns a text output of one command.
+        '''
+        return self.run_cmds([command], format = "text")[0]["output"]
+
+    def send_commands(self, commands):
+        '''
+        Allows to get JSON output of several show commands in one request.
+        '''
+        return self.run_cmds(commands)
+
+    def send_config_set(self, commands):
+        '''
+        The same as netmiko send_config_set: all commands are applied in one request, text outputs are joined.
+        '''
+        result = self.run_cmds(["enable", "configure"] + list(commands) + ["end"], format = "text")
+        return "".join(item.get("output", "") for item in result)
+
+    def find_prompt(self):
+        return self.run_cmds(["show hostname"])[0]["hostname"] + "#"
+
+    def enable(self):
+        '''
+        Commands are always run in privileged mode via eAPI, nothing to do here.
+        '''
+
+    def is_alive(self):
+        return True
+
+    def disconnect(self):
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+
+def run_with_hostname(connection, command, format = "text"):
+    '''
+    Allows to get the output of the command and the hostname of the switch in one request instead of send_command and find_prompt.
+    '''
+    output, hostname = connection.run_cmds([command, "show hostname"], format)
+    if format == "text":
+        return output["output"], HOSTNAME_REGEX.search(hostname["output"]).group(1)
+    return output, hostname["hostname"]
+
+def filter_peers(peers, filters):
+    '''
+    Allows to apply "| include" and "| exclude" filters of the text command to bgp peers, eAPI doesn't accept filters with JSON output.
+    A peer matches the filter if its description, ip-address or state contains the value(for example "exclude Estab" drops established peers).
+    '''
+    for pipe in filters:
+        keyword, _, value = pipe.strip().partition(" ")
+        matches = lambda peer: any(value in field for field in (peer.description, peer.ip, peer.state))
+        if keyword in ("in", "inc", "include"):
+            peers = [peer for peer in peers if matches(peer)]
+        elif keyword in ("ex", "exc", "exclude"):
+            peers = [peer for peer in peers if not matches(peer)]
+        else:
+            raise ValueError(f"{pipe!r} filter can't be applied to JSON output")
+    return peers
+
+def bgp_peers(connection, command = "show ip bgp summary", vrf = "default"):
+    '''
+    Allows to get bgp peers(bgp_parser.BgpPeer) of the text command(filters are applied with filter_peers) and the hostname of the switch
+    from JSON output of one request.
+    '''
+    show, *filters = command.split(" | ")
+    summary, hostname = run_with_hostname(connection, show, format = "json")
+    return filter_peers(peers_from_json(summary, vrf), filters), hostname
@@ -22,84 +22,348 @@
 #   username: <username>
 #   password: <password>
 # ...etc...
+# Other keys(site, role, platform) can be added to select only some devices: --site ams1 --role edge(see inventory.py).
+# With --adaptive descriptions are gathered by scheduler.py: the number of sessions starts from --limit and follows devices answers,
+# transient errors are retried and switches which still fail are printed and left out of the second part.
+# --site-limit SITE=N and --aaa-limit SERVER=N cap simultaneous sessions per site and per TACACS/RADIUS server(site and aaa keys of the inventory).
+# Devices with "transport: eapi"(see eapi.py) get the show command and "show hostname" in one request.
 
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
 from concurrent.futures import ThreadPoolExecutor
-from netmiko import ConnectHandler
+from session_pool import SessionPool, open_session, device_name, session_key
+from streaming import as_completed_bounded
+from capture import capture_command
+from eapi import EapiConnection, run_with_hostname
+from show_cache import ShowCache
+from inventory import Inventory
+from fleet import run_sharded
+from scheduler import AdaptiveScheduler, limit_option
+import timing
+import argparse
+import sys
 from pprint import pprint
 import re
 from itertools import repeat
-import yaml
 
-def send_show_command(device, command):
+# One row of "show interfaces description" output, the description is everything after Protocol column(it can have any number of words).
+DESCRIPTION_ROW_REGEX = re.compile(r'^(?P<interface>Po\d+)\s+(?P<status>admin down|up|down)\s+(?P<proto>up|down)\s+(?P<descr>.*?)\s*$')
+
+def send_show_command(device, command, pool = None, cache = None):
     '''
     Sends show command to device and also gather a current network device prompt(hostname variable will be parsed in find_ip function later).
+    If pool is given, the session is taken from it and stays open for the next commands.
+    If cache(show_cache.ShowCache) is given, a fresh cached output is returned without connecting to the device.
     '''
-    with ConnectHandler(**device) as ssh:
-        output = ssh.send_command(command)
-        hostname = ssh.find_prompt()
+    if cache is not None:
+        total = cache.get(device, command)
+        if total is not None:
+            return total
+    with open_session(device, pool) as ssh:
+        if isinstance(ssh, EapiConnection):
+            output, hostname = run_with_hostname(ssh, command)
+            hostname += "#"
+        else:
+            output = ssh.send_command(command)
+            hostname = ssh.find_prompt()
         total = f'{hostname}{command}\n{output}'
+    if cache is not None:
+        cache.put(device, command, total)
     return total
 
-def find_ip(devices, command, limit):
+def find_ip(devices, command, limit, pool = None, cache = None):
     '''
-    Executes the send_show_command function on all devices from yaml file, parse an output and return a list of nested dictionaries with switch hostname as key and interface and description as value.
+    Executes the send_show_command function on all devices from yaml file, parse an output and return a list of (device, nested dictionary) pairs,
+    nested dictionary has switch hostname as key and interface and description as value. The device is kept with its result, so the result
+    can't be matched with another switch(see plan_changes).
     Variables:
     result - is the result of execution the first function on all devices. 
-    interface/description/hostname _regexes - are regexes to parse this values.
-    end_list - list of nested dictionaries from all devices with switch hostname as key and interface and description as value. 
+    DESCRIPTION_ROW_REGEX/hostname_regex - are regexes to parse this values, every row gives one interface and its description.
+    end_list - list of (device, nested dictionary) pairs from all devices, nested dictionary has switch hostname as key and interface and description as value.
     switch - output from one particular switch.
-    interfaces/descriptions/hostnames - iterators for respective values from one particular switch.
-    list_of_interfaces/list_of_descriptions - lists of interfaces and descriptions values from one particular switch.
+    hostnames - iterator for hostname values from one particular switch.
+    int_descr_dict - dictionary with interface as key and description as value from one particular switch.
     end_result - nested dictionary from one particular switch with switch hostname as key and interface and description as value.
     interface/descr - one particular interface/interface description from one particular switch.
     hostname - switch hostname.
     Arista uses below type of "show interfaces description" command output(Status values can be "up"/"down"/"admin down" and Protocol - "up"/"down"):
     Interface                      Status         Protocol           Description
     Po1                            up             up                 ISP1-<channel-id>
+    Outputs are parsed while they are received(see collect_descriptions), so only parsed descriptions are kept in end_list.
     '''
     with ThreadPoolExecutor(max_workers = limit) as executor:
-        result = executor.map(send_show_command, devices, repeat(command))
-        interface_regex = (r'Po(?P<interface>\d+)\s+')
-        description_regex = (r'(?P<proto>up|down)\s+(?P<descr>\S+\s\S+)')
-        hostname_regex = (r'(?P<hostname>\S+)#')
+        result = executor.map(collect_descriptions, devices, repeat(command), repeat(pool), repeat(cache))
         end_list = []
-        for switch in result:
-            interfaces = re.finditer(interface_regex, switch)
-            descriptions = re.finditer(description_regex, switch)
-            hostnames = re.finditer(hostname_regex, switch)
-            list_of_interfaces = []
-            list_of_descriptions = []
-            end_result = {}
-            for match in interfaces:
-                interface = match.group().strip()
-                list_of_interfaces.append(interface)
-            for match in descriptions:
-                descr = match.group(2)
-                list_of_descriptions.append(descr)
-            int_descr_dict = dict(zip(list_of_interfaces,list_of_descriptions))
-            for match in hostnames:
-                hostname = match.group().strip("#")
-            end_result[hostname] = int_descr_dict
-            end_list.append(end_result)
-        return end_list     
-
-def send_config_commands(device, commands):
+        for device, end_result in zip(devices, result):
+            end_list.append((device, end_result))
+        return end_list
+
+@timing.timed("parse")
+def parse_descriptions(switch):
+    '''
+    Allows to parse an output from one particular switch(see find_ip function for variables description) and return a nested dictionary
+    with switch hostname as key and interface and description as value.
+    '''
+    hostname_regex = (r'(?P<hostname>\S+)#')
+    hostnames = re.finditer(hostname_regex, switch)
+    end_result = {}
+    parser = DescriptionParser()
+    for line in switch.splitlines():
+        parser.feed(line)
+    int_descr_dict = parser.result()
+    for match in hostnames:
+        hostname = match.group().strip("#")
+    end_result[hostname] = int_descr_dict
+    return end_result
+
+def find_ip_sharded(devices, command, processes, threads):
+    '''
+    The same as find_ip, but devices are split between processes worker processes with threads threads each(see fleet.py).
+    Sessions can't be shared between processes, so there is no pool here. Failed switches are returned as a separate list.
+    '''
+    return run_sharded(collect_descriptions, devices, (command,), processes = processes, threads = threads)
+
+def find_ip_adaptive(devices, command, scheduler, pool = None, cache = None):
+    '''
+    The same as find_ip_sharded, but switches are run in threads by scheduler(scheduler.AdaptiveScheduler): the number of sessions
+    follows devices answers and transient errors are retried. Failed switches are returned as a separate list.
+    The scheduler returns results in order of completion, they are put back in devices order, as find_ip returns them.
+    '''
+    results, failures = scheduler.run(collect_descriptions, devices, args = (command, pool, cache))
+    positions = {id(device): position for position, device in enumerate(devices)}
+    results.sort(key = lambda pair: positions[id(pair[0])])
+    failures.sort(key = lambda pair: positions[id(pair[0])])
+    return results, [(device_name(device), error) for device, error in failures]
+
+class DescriptionParser:
+    '''
+    Line by line parser of "show interfaces description" output, used by parse_descriptions and by capture.py while the output is received.
+    Every row is parsed on its own(see DESCRIPTION_ROW_REGEX), so a description of one interface can't be matched with another one.
+    Interfaces without description are skipped, there is nothing to add a prefix to.
+    '''
+    def __init__(self):
+        self.int_descr_dict = {}
+
+    def feed(self, line):
+        match = DESCRIPTION_ROW_REGEX.match(line.strip())
+        if match and match.group("descr"):
+            self.int_descr_dict[match.group("interface")] = match.group("descr")
+
+    def result(self):
+        return self.int_descr_dict
+
+def collect_descriptions(device, command, pool = None, cache = None):
+    '''
+    Allows to gather and parse an output of one switch. Without cache the output is parsed line by line as it is received and never kept
+    (see capture.py), the hostname is taken from the prompt. With cache the whole output is gathered with send_show_command.
+    eAPI sessions get the output and the hostname in one request(see eapi.run_with_hostname).
+    '''
+    if cache is not None:
+        return parse_descriptions(send_show_command(device, command, pool, cache))
+    parser = DescriptionParser()
+    with open_session(device, pool) as ssh:
+        if isinstance(ssh, EapiConnection):
+            output, hostname = run_with_hostname(ssh, command)
+            for line in output.splitlines():
+                parser.feed(line)
+            return {hostname: parser.result()}
+        hostname = ssh.find_prompt()[:-1]
+        capture_command(ssh, command, [parser.feed], keep_raw = False, device = device_name(device), hostname = hostname)
+    return {hostname: parser.result()}
+
+def find_ip_stream(devices, command, limit, pool = None, window = None, cache = None):
+    '''
+    The streaming version of find_ip: yields one record per switch as soon as the switch is finished and parsed, not in devices list order.
+    Only window(2 * limit by default) switches are in progress at once, so memory usage doesn't depend on the number of switches.
+    Record example: {'device': 'edge-switch-1', 'hostname': 'edge-switch-1', 'interfaces': {'Po1': 'ISP1', 'Po2': 'ISP2'}}
+    If a switch fails, the record contains 'error' instead of 'hostname' and 'interfaces'.
+    Records can be written as JSON lines with streaming.write_jsonl.
+    '''
+    collect = lambda device: collect_descriptions(device, command, pool, cache)
+    for device, future in as_completed_bounded(collect, devices, limit, window):
+        try:
+            end_result = future.result()
+        except Exception as error:
+            yield {"device": device_name(device), "error": repr(error)}
+            continue
+        for hostname, int_descr_dict in end_result.items():
+            yield {"device": device_name(device), "hostname": hostname, "interfaces": int_descr_dict}
+
+def send_config_commands(device, commands, pool = None, cache = None):
     '''
     Sends config command to device.
+    If cache is given, all cached outputs of the device are invalidated(even if the push has failed, part of commands could be applied).
     '''
-    with ConnectHandler(**device) as ssh:
-        ssh.enable()
-        result = ssh.send_config_set(commands)
+    try:
+        with open_session(device, pool) as ssh:
+            ssh.enable()
+            result = ssh.send_config_set(commands)
+    finally:
+        if cache is not None:
+            cache.invalidate(device)
     return result
 
+def desired_description(description, prefix = "UPLINK-"):
+    '''
+    Allows to get the description which the interface should have: descriptions which already begin with prefix are left as is,
+    so running the script twice doesn't make "UPLINK-UPLINK-ISP1".
+    '''
+    if description.startswith(prefix):
+        return description
+    return prefix + description
+
+def plan_changes(devices_output, prefix = "UPLINK-"):
+    '''
+    Allows to compare current and desired descriptions and return a list of (device, list of changes) pairs.
+    devices_output is a list of (device, result) pairs from find_ip, the plan stays attached to the device it was made from,
+    so two switches with the same host(different port or username) never get each other's changes.
+    One change is a (interface, current description, desired description) tuple, interfaces which are already correct are not included.
+    '''
+    plans = []
+    for device, end_result in devices_output:
+        changes = []
+        for hostname, int_descr_dict in end_result.items():
+            for interface, description in int_descr_dict.items():
+                desired = desired_description(description, prefix)
+                if desired != description:
+                    changes.append((interface, description, desired))
+        plans.append((device, changes))
+    return plans
+
+def changes_to_commands(changes):
+    commands = []
+    for interface, current, desired in changes:
+        commands.extend([f"interface {interface}", f"description {desired}"])
+    return commands
+
+def build_commands(devices_output, prefix = "UPLINK-"):
+    '''
+    Allows to make a list of (device, list of config commands) pairs from the find_ip result.
+    Only interfaces which need a change get commands.
+    '''
+    return [(device, changes_to_commands(changes)) for device, changes in plan_changes(devices_output, prefix)]
+
+def rollout_waves(jobs, canary, batch_size):
+    '''
+    Allows to split jobs into rollout waves: the first wave consists of canary jobs, all next waves - of batch_size jobs.
+    '''
+    waves = []
+    if canary:
+        waves.append(jobs[:canary])
+    for start in range(canary, len(jobs), batch_size):
+        waves.append(jobs[start:start + batch_size])
+    return waves
+
+def push_one(device, commands, pool = None, cache = None):
+    '''
+    Allows to push commands to one switch and to return the result as a dictionary instead of raising an exception.
+    '''
+    try:
+        output = send_config_commands(device, commands, pool, cache)
+    except Exception as error:
+        return {"device": device_name(device), "status": "failed", "error": repr(error)}
+    return {"device": device_name(device), "status": "ok", "output": output}
+
+def push_config(devices, commands_list, limit, canary = 1, batch_size = 10, max_failures = 1, pool = None, cache = None):
+    '''
+    Allows to push per switch commands in parallel rollout waves(see rollout_waves) and return a list of per switch results in devices order.
+    Switches of one wave are configured simultaneously(no more than limit at once), the next wave starts only after the previous one is finished.
+    When the number of failed switches reaches max_failures, the rollout stops and switches from the next waves get "skipped" status.
+    Switches with an empty list of commands get "noop" status and are not connected to.
+    '''
+    results = [None] * len(devices)
+    jobs = []
+    for position, (device, commands) in enumerate(zip(devices, commands_list)):
+        if commands:
+            jobs.append((position, device, commands))
+        else:
+            results[position] = {"device": device_name(device), "status": "noop"}
+    failures = 0
+    with ThreadPoolExecutor(max_workers = limit) as executor:
+        for wave in rollout_waves(jobs, canary, batch_size):
+            if failures >= max_failures:
+                for position, device, commands in wave:
+                    results[position] = {"device": device_name(device), "status": "skipped"}
+                continue
+            devices_in_wave = [device for position, device, commands in wave]
+            commands_in_wave = [commands for position, device, commands in wave]
+            for (position, device, commands), result in zip(wave, executor.map(push_one, devices_in_wave, commands_in_wave, repeat(pool), repeat(cache))):
+                if result["status"] == "failed":
+                    failures += 1
+                results[position] = result
+    return results
+
+def reconcile(devices, devices_output, limit, prefix = "UPLINK-", dry_run = False, pool = None, cache = None, **rollout):
+    '''
+    Allows to push only the difference between current and desired descriptions.
+    Switches without changes get "noop" status and no config session is opened to them, with dry_run nothing is pushed at all.
+    Every switch is pushed from its own plan(see plan_changes), switches without gathered descriptions(failed ones) are left out.
+    rollout - canary/batch_size/max_failures parameters of push_config.
+    Returns a list of per switch results and a summary, for example:
+    {'switches': 40, 'planned_switches': 2, 'planned_changes': 3, 'applied_switches': 2, 'applied_changes': 3, 'failed': 0, 'skipped': 0}
+    '''
+    selected = {session_key(device) for device in devices}
+    plans = [(device, changes) for device, changes in plan_changes(devices_output, prefix) if session_key(device) in selected]
+    if dry_run:
+        results = [{"device": device_name(device), "status": "planned" if changes else "noop"} for device, changes in plans]
+    else:
+        results = push_config([device for device, changes in plans], [changes_to_commands(changes) for device, changes in plans], limit,
+                              pool = pool, cache = cache, **rollout)
+    for result, (device, changes) in zip(results, plans):
+        result["changes"] = changes
+    statuses = [result["status"] for result in results]
+    summary = {
+        "switches": len(results),
+        "planned_switches": sum(1 for device, changes in plans if changes),
+        "planned_changes": sum(len(changes) for device, changes in plans),
+        "applied_switches": statuses.count("ok"),
+        "applied_changes": sum(len(result["changes"]) for result in results if result["status"] == "ok"),
+        "failed": statuses.count("failed"),
+        "skipped": statuses.count("skipped"),
+    }
+    return results, summary
+
 if __name__ == "__main__":
-    with open('devices.yaml') as f:
-        devices = yaml.safe_load(f)
-        devices_output = find_ip(devices, "show interfaces Port-Channel 1-4 description", limit = 2)
-        pprint(devices_output)
+    # Both parts share one session pool, so each switch is logged in only once.
+    # With --cache option descriptions younger than 60 seconds are taken from the local cache(show_cache.py), pushed switches are removed from it.
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cache", action="store_true", help="use cached outputs of previous runs")
+    parser.add_argument("--dry-run", action="store_true", help="only show planned changes")
+    parser.add_argument("--site")
+    parser.add_argument("--role")
+    parser.add_argument("--platform")
+    parser.add_argument("--limit", type=int, default=2)
+    parser.add_argument("--processes", type=int, help="gather descriptions with several worker processes")
+    parser.add_argument("--adaptive", action="store_true", help="gather descriptions with adaptive number of sessions and retries")
+    parser.add_argument("--site-limit", type=limit_option, action="append", default=[], metavar="SITE=N",
+                        help="maximum number of sessions to devices of the site with --adaptive")
+    parser.add_argument("--aaa-limit", type=limit_option, action="append", default=[], metavar="SERVER=N",
+                        help="maximum number of sessions to devices of the TACACS/RADIUS server with --adaptive")
+    parser.add_argument("--timing", help="save phase timings to TIMING.json and TIMING.prom(see timing.py)")
+    parser.add_argument("--canary", type=int, default=1, help="number of switches in the first rollout wave")
+    parser.add_argument("--batch-size", type=int, default=10, help="number of switches in every next rollout wave")
+    parser.add_argument("--max-failures", type=int, default=1, help="number of failed switches which stops the rollout")
+    parser.add_argument("--push-limit", type=int, default=10, help="number of switches configured at once")
+    args = parser.parse_args()
+    if args.batch_size < 1 or args.push_limit < 1 or args.canary < 0 or args.max_failures < 1:
+        parser.error("--batch-size, --push-limit and --max-failures should be positive, --canary can't be negative")
+    recorder = timing.install() if args.timing else None
+    cache = ShowCache() if args.cache else None
+    devices = Inventory.load('devices.yaml').select(site = args.site, role = args.role, platform = args.platform)
+    with SessionPool() as pool:
+        command = "show interfaces Port-Channel 1-4 description"
+        errors = None
+        if args.processes:
+            devices_output, errors = find_ip_sharded(devices, command, args.processes, args.limit)
+        elif args.adaptive:
+            scheduler = AdaptiveScheduler(initial = args.limit, site_limits = dict(args.site_limit), aaa_limits = dict(args.aaa_limit))
+            devices_output, errors = find_ip_adaptive(devices, command, scheduler, pool = pool, cache = cache)
+        else:
+            devices_output = find_ip(devices, command, limit = args.limit, pool = pool, cache = cache)
+        if errors is not None:
+            pprint(errors)
+        pprint([end_result for device, end_result in devices_output])
         # The result of this part of code should be something like this:
         # [{'edge-switch-1': {'Po1': 'ISP1',
         #                     'Po2': 'ISP2',
@@ -108,47 +372,61 @@ if __name__ == "__main__":
         #                     'Po2': 'ISP2',
         #                     'Po3': 'ISP3'}}]
         #
-        # After this second part of code will ecexute. The idea is to extract from above output lists of command, which will be send to appripriate switches.   
-        # Variables:
-        # interfaces/descriptions - lists of interfaces and descriptions respectively.
-        # device - nested dictionary from one particular switch with switch hostname as key and interface and description as value.
-        # commands - list of commands intended for one particular switch.
-        # interface - string in "interface Po1" format.
-        # description - string in "description UPLINK-ISP1" format.
-        # command - pair of commands to enter interface mode and add the modified description.
-        # switch - a set of settings for ssh connection for one particular switch.
-        interfaces = []
-        descriptions = []
-        for device in devices_output:
-            commands = []
-            for hostname, int_descr_dict in device.items():
-                for interface, description in int_descr_dict.items():
-                    interface = str("interface ") + interface
-                    description = str("description ") + "UPLINK-" + description
-                    command = [interface] + [description]
-                    commands.extend(command)
-        for switch in devices:
-            pprint(send_config_commands(switch, commands))
-            
-            # The result of this part of code should be something like this:
-            # ('config term\n'
-            #  'edge-switch-1(config)#interface Po1\n'
-            #  'edge-switch-1(config-if-Po1)#description UPLINK-ISP1\n'
-            #  'edge-switch-1(config-if-Po1)#interface Po2\n'
-            #  'edge-switch-1(config-if-Po2)#description UPLINK-ISP2\n'
-            #  'edge-switch-1(config-if-Po2)#interface Po3\n'
-            #  'edge-switch-1(config-if-Po3)#description UPLINK-ISP3\n'
-            #  'edge-switch-1(config-if-Po3)#end\n'
-            #  'edge-switch-1#')
-            # ('config term\n'
-            #  'edge-switch-2(config)#interface Po1\n'
-            #  'edge-switch-2(config-if-Po1)#description UPLINK-ISP1\n'
-            #  'edge-switch-2(config-if-Po1)#interface Po2\n'
-            #  'edge-switch-2(config-if-Po2)#description UPLINK-ISP2\n'
-            #  'edge-switch-2(config-if-Po2)#interface Po3\n'
-            #  'edge-switch-2(config-if-Po3)#description UPLINK-ISP3\n'
-            #  'edge-switch-2(config-if-Po3)#end\n'
-            #  'edge-switch-2#')
-            
+        # After this second part of code will ecexute. The idea is to extract from above output lists of command, which will be send to appripriate switches.
+        # Only interfaces without "UPLINK-" get commands(see reconcile), switches where all descriptions are already correct are not configured at all.
+        # Commands are pushed in parallel waves(no more than --push-limit switches at once): first --canary switches(1 by default),
+        # then batches of --batch-size switches(10 by default).
+        # If --max-failures switches fail(1 by default), the rollout stops and all remaining switches are reported as skipped.
+        # With --dry-run option planned changes are only printed.
+        results, summary = reconcile(devices, devices_output, limit = args.push_limit, dry_run = args.dry_run, pool = pool, cache = cache,
+                                     canary = args.canary, batch_size = args.batch_size, max_failures = args.max_failures)
+        for result in results:
+            pprint(result, sort_dicts=False)
+        pprint(summary, sort_dicts=False)
+        if cache is not None:
+            print(cache.stats(), file=sys.stderr)
+            cache.close()
+        if recorder is not None:
+            recorder.write_json(args.timing + ".json")
+            recorder.write_prometheus(args.timing + ".prom")
+
+        # The result of this part of code should be something like this:
+        # {'device': 'edge-switch-1',
+        #  'status': 'ok',
+        #  'output': ('config term\n'
+        #             'edge-switch-1(config)#interface Po1\n'
+        #             'edge-switch-1(config-if-Po1)#description UPLINK-ISP1\n'
+        #             'edge-switch-1(config-if-Po1)#interface Po2\n'
+        #             'edge-switch-1(config-if-Po2)#description UPLINK-ISP2\n'
+        #             'edge-switch-1(config-if-Po2)#interface Po3\n'
+        #             'edge-switch-1(config-if-Po3)#description UPLINK-ISP3\n'
+        #             'edge-switch-1(config-if-Po3)#end\n'
+        #             'edge-switch-1#'),
+        #  'changes': [('Po1', 'ISP1', 'UPLINK-ISP1'),
+        #              ('Po2', 'ISP2', 'UPLINK-ISP2'),
+        #              ('Po3', 'ISP3', 'UPLINK-ISP3')]}
+        # {'device': 'edge-switch-2',
+        #  'status': 'ok',
+        #  'output': ('config term\n'
+        #             'edge-switch-2(config)#interface Po1\n'
+        #             'edge-switch-2(config-if-Po1)#description UPLINK-ISP1\n'
+        #             'edge-switch-2(config-if-Po1)#interface Po2\n'
+        #             'edge-switch-2(config-if-Po2)#description UPLINK-ISP2\n'
+        #             'edge-switch-2(config-if-Po2)#interface Po3\n'
+        #             'edge-switch-2(config-if-Po3)#description UPLINK-ISP3\n'
+        #             'edge-switch-2(config-if-Po3)#end\n'
+        #             'edge-switch-2#'),
+        #  'changes': [('Po1', 'ISP1', 'UPLINK-ISP1'),
+        #              ('Po2', 'ISP2', 'UPLINK-ISP2'),
+        #              ('Po3', 'ISP3', 'UPLINK-ISP3')]}
+        # {'switches': 2,
+        #  'planned_switches': 2,
+        #  'planned_changes': 6,
+        #  'applied_switches': 2,
+        #  'applied_changes': 6,
+        #  'failed': 0,
+        #  'skipped': 0}
+        # The second run finds nothing to change: both switches get {'status': 'noop', 'changes': []} and no config session is opened.
+
 # This script can be used for other purposes as well. For example to gather an information about inactive bgp peers and then to delete them. 
 # Or only the first part of this code can be implemented, for information gathering purposes.
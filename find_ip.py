@@ -9,62 +9,182 @@
 #   username: <username>
 #   password: <password>
 # ...etc...
+# By default results are printed in order of completion, so one slow switch doesn't hold back the others.
+# With --jsonl option one JSON line per switch is written to stdout(or to the file: --jsonl result.jsonl).
+# With --cache option outputs younger than 60 seconds are taken from the local cache(show_cache.py) instead of the switches.
+# Devices can be filtered by inventory keys(see inventory.py): --site ams1 --role edge --platform arista_eos.
+# With --processes N devices are split between N processes(see fleet.py) with --limit threads each, so parsing uses all CPU cores.
+# With --adaptive the number of simultaneous sessions starts from --limit and follows devices answers(see scheduler.py),
+# transient errors are retried and switches which still fail are printed at the end instead of stopping the run.
+# --site-limit SITE=N and --aaa-limit SERVER=N cap simultaneous sessions per site and per TACACS/RADIUS server(site and aaa keys of the inventory).
+# Outputs are parsed line by line while they are received(see capture.py), so even full-table outputs from hundreds of switches are not kept in memory.
+# With --timing PREFIX per device and per phase timings are saved to PREFIX.json and PREFIX.prom(see timing.py).
+# Devices with "transport: eapi"(see eapi.py) get the command and "show hostname" in one request and peers are taken from JSON output.
 
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
 from concurrent.futures import ThreadPoolExecutor
-from netmiko import ConnectHandler
-import re
+from session_pool import SessionPool, open_session, device_name
+from streaming import as_completed_bounded, write_jsonl
+from bgp_parser import parse_bgp_summary, SummaryParser
+from capture import capture_command
+from eapi import EapiConnection, bgp_peers, run_with_hostname
+from show_cache import ShowCache
+from inventory import Inventory
+from fleet import run_sharded
+from scheduler import AdaptiveScheduler, limit_option
+import timing
+import argparse
+import sys
 from itertools import repeat
-import yaml
 
-def send_show_command(device, command):
+def send_show_command(device, command, pool = None, cache = None):
     '''
     Allows to gather an output of "show ip bgp summary | exclude Estab" command with current network device prompt.
+    If pool is given, the session is taken from it and stays open for the next commands.
+    If cache(show_cache.ShowCache) is given, a fresh cached output is returned without connecting to the device.
     '''
-    with ConnectHandler(**device) as ssh:
-        output = ssh.send_command(command)
-        hostname = ssh.find_prompt()
+    if cache is not None:
+        total = cache.get(device, command)
+        if total is not None:
+            return total
+    with open_session(device, pool) as ssh:
+        if isinstance(ssh, EapiConnection):
+            output, hostname = run_with_hostname(ssh, command)
+            hostname += "#"
+        else:
+            output = ssh.send_command(command)
+            hostname = ssh.find_prompt()
         total = f'{hostname}{command}\n{output}'
+    if cache is not None:
+        cache.put(device, command, total)
     return total
 
-with open('devices.yaml') as f:
-    devices = yaml.safe_load(f)
-
-def find_ip(devices, command, limit):
+def find_ip(devices, command, limit, pool = None, cache = None):
     '''
     Allows ho have a list of outputs from all switches.
     '''
     end_list = []
     with ThreadPoolExecutor(max_workers = limit) as executor:
-        result = executor.map(send_show_command, devices, repeat(command))
+        result = executor.map(send_show_command, devices, repeat(command), repeat(pool), repeat(cache))
     for switch_output in result:
         end_list.append(switch_output)
     return end_list
 
-# Here the result of second function begins to parse. 
-# Variables ip_addresses and hostnames are iterators from which values of devices hostnames and inactive bgp peers ip-addresses are extracted.
-# Variable end_result is a dictionary with device hostname as key and list of inactive bgp peers ip-addresses as value.
+@timing.timed("parse")
+def parse_inactive_peers(switch_output):
+    '''
+    Allows to parse one switch output of the first function and to return a dictionary with device hostname as key and list of inactive bgp peers ip-addresses as value.
+    The output begins with the device prompt, so the hostname is the text before the first "#", peers are parsed with bgp_parser.
+    '''
+    hostname, _, output = switch_output.partition("#")
+    list_of_ips = [peer.ip for peer in parse_bgp_summary(output)]
+    end_result = {hostname: list_of_ips}
+    return end_result
+
+def collect_inactive_peers(device, command, pool = None, cache = None):
+    '''
+    Allows to gather and parse an output of one switch. Without cache the output is never kept: lines are parsed as soon as they are received
+    and only peers ip-addresses are collected(see capture.py), the hostname is taken from the prompt. With cache the whole output is needed,
+    so it is gathered with send_show_command. eAPI sessions return peers and the hostname from JSON output of one request(see eapi.bgp_peers).
+    '''
+    if cache is not None:
+        return parse_inactive_peers(send_show_command(device, command, pool, cache))
+    parser = SummaryParser(keep = lambda peer: peer.ip)
+    with open_session(device, pool) as ssh:
+        if isinstance(ssh, EapiConnection):
+            peers, hostname = bgp_peers(ssh, command)
+            return {hostname: [peer.ip for peer in peers]}
+        hostname = ssh.find_prompt()[:-1]
+        capture_command(ssh, command, [parser.feed], keep_raw = False, device = device_name(device), hostname = hostname)
+    return {hostname: parser.peers}
+
+def find_ip_stream(devices, command, limit, pool = None, window = None, cache = None):
+    '''
+    The streaming version of find_ip: yields one record per switch as soon as the switch is finished and parsed.
+    Only window(2 * limit by default) switches are in progress at once, so memory usage doesn't depend on the number of switches.
+    Record example: {'device': '192.168.111.111', 'hostname': 'switch-1', 'peers': ['10.10.10.1', '20.20.20.1']}
+    If a switch fails, the record contains 'error' instead of 'hostname' and 'peers'.
+    '''
+    collect = lambda device: collect_inactive_peers(device, command, pool, cache)
+    for device, future in as_completed_bounded(collect, devices, limit, window):
+        try:
+            end_result = future.result()
+        except Exception as error:
+            yield {"device": device_name(device), "error": repr(error)}
+            continue
+        for hostname, list_of_ips in end_result.items():
+            yield {"device": device_name(device), "hostname": hostname, "peers": list_of_ips}
+
+def find_ip_adaptive(devices, command, scheduler, pool = None, cache = None):
+    '''
+    The same records as find_ip_stream, but switches are run by scheduler(scheduler.AdaptiveScheduler).
+    Records of switches which failed after all retries come after all successful ones.
+    '''
+    results, failures = scheduler.run(collect_inactive_peers, devices, args = (command, pool, cache))
+    for device, end_result in results:
+        for hostname, list_of_ips in end_result.items():
+            yield {"device": device_name(device), "hostname": hostname, "peers": list_of_ips}
+    for device, error in failures:
+        yield {"device": device_name(device), "error": error}
+
 if __name__ == "__main__":
-    devices_output = find_ip(devices, "show ip bgp summary | exclude Estab", limit = 2)
-    ip_regex = (r'\s+(?P<ip>(\d+\.){3}\d+)')
-    hostname_regex = (r'(?P<hostname>\S+)#')
-    for switch_output in devices_output:
-        ip_addresses = re.finditer(ip_regex, switch_output)
-        hostnames = re.finditer(hostname_regex, switch_output)
-        end_result = {}
-        list_of_ips = []
-        for match in hostnames:
-            hostname = match.group().strip("#")
-        for match in ip_addresses:
-            one_ip = match.group().strip()
-            list_of_ips.append(one_ip)
-        end_result[hostname] = list_of_ips
-        print(end_result)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jsonl", nargs="?", const="-", help="write one JSON line per switch to stdout or to the file")
+    parser.add_argument("--cache", action="store_true", help="use cached outputs of previous runs")
+    parser.add_argument("--site")
+    parser.add_argument("--role")
+    parser.add_argument("--platform")
+    parser.add_argument("--limit", type=int, default=2, help="number of threads(per process with --processes)")
+    parser.add_argument("--processes", type=int, help="number of worker processes")
+    parser.add_argument("--adaptive", action="store_true", help="start from --limit sessions, adapt it and retry transient errors")
+    parser.add_argument("--site-limit", type=limit_option, action="append", default=[], metavar="SITE=N",
+                        help="maximum number of sessions to devices of the site with --adaptive")
+    parser.add_argument("--aaa-limit", type=limit_option, action="append", default=[], metavar="SERVER=N",
+                        help="maximum number of sessions to devices of the TACACS/RADIUS server with --adaptive")
+    parser.add_argument("--timing", help="save phase timings to TIMING.json and TIMING.prom")
+    args = parser.parse_args()
+    recorder = timing.install() if args.timing else None
+    devices = Inventory.load('devices.yaml').select(site = args.site, role = args.role, platform = args.platform)
+    command = "show ip bgp summary | exclude Estab"
+    if args.processes:
+        results, errors = run_sharded(collect_inactive_peers, devices, (command,), processes = args.processes, threads = args.limit)
+        for device, end_result in results:
+            print(end_result)
+        for name, error in errors:
+            print({name: error})
+        sys.exit()
+    cache = ShowCache() if args.cache else None
+    with SessionPool() as pool:
+        if args.adaptive:
+            scheduler = AdaptiveScheduler(initial = args.limit, site_limits = dict(args.site_limit), aaa_limits = dict(args.aaa_limit))
+            records = find_ip_adaptive(devices, command, scheduler, pool = pool, cache = cache)
+        else:
+            records = find_ip_stream(devices, command, limit = args.limit, pool = pool, cache = cache)
+        if args.jsonl and args.jsonl != "-":
+            with open(args.jsonl, "w") as result_file:
+                write_jsonl(records, result_file)
+        elif args.jsonl:
+            write_jsonl(records)
+        else:
+            for record in records:
+                if "error" in record:
+                    print({record["device"]: record["error"]})
+                else:
+                    print({record["hostname"]: record["peers"]})
+    if cache is not None:
+        print(cache.stats(), file=sys.stderr)
+        cache.close()
+    if recorder is not None:
+        recorder.write_json(args.timing + ".json")
+        recorder.write_prometheus(args.timing + ".prom")
         
 # The result should be something like this:
 #  % ./find_ip.py  
 # {'192.168.111.111': ['10.10.10.1', '20.20.20.1', '30.30.30.1', '40.40.40.1']}
 # {'192.168.111.222': ['10.10.10.2', '20.20.20.2', '30.30.30.2', '40.40.40.2']}
+#  % ./find_ip.py --jsonl
+# {"device": "192.168.111.222", "hostname": "192.168.111.222", "peers": ["10.10.10.2", "20.20.20.2", "30.30.30.2", "40.40.40.2"]}
+# {"device": "192.168.111.111", "hostname": "192.168.111.111", "peers": ["10.10.10.1", "20.20.20.1", "30.30.30.1", "40.40.40.1"]}
 # Then for example with jinja2 help and simple new python script or ansible playbook this peers can be deleted from devices.
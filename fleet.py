@@ -0,0 +1,59 @@
+# Executor for large fleets: devices are split into shards, every shard is processed by its own process with its own thread pool.
+# So ssh sessions are handled by threads and regex parsing is spread over all CPU cores instead of one GIL.
+# function should be defined on module level(it is sent to worker processes) and should take a device as the first argument.
+# Usage:
+# results, errors = run_sharded(collect_inactive_peers, devices, args = ("show ip bgp summary",), processes = 4, threads = 20)
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from session_pool import device_name
+import os
+
+def call(function, device, args):
+    try:
+        return True, function(device, *args)
+    except Exception as error:
+        return False, repr(error)
+
+def run_shard(function, shard, args, threads):
+    '''
+    Allows to run function on all devices of one shard in a thread pool, it is executed in a worker process.
+    '''
+    with ThreadPoolExecutor(max_workers = threads) as executor:
+        return list(executor.map(lambda device: call(function, device, args), shard))
+
+def make_shards(devices, processes):
+    '''
+    Allows to split devices into shards of nearly equal size keeping the order of devices.
+    '''
+    size, rest = divmod(len(devices), processes)
+    shards = []
+    start = 0
+    for number in range(processes):
+        end = start + size + (1 if number < rest else 0)
+        if end > start:
+            shards.append(devices[start:end])
+        start = end
+    return shards
+
+def run_sharded(function, devices, args = (), processes = None, threads = 10):
+    '''
+    Allows to run function(device, *args) on all devices using processes worker processes(number of CPU cores by default)
+    with threads threads each, and to merge results.
+    Returns a list of (device, result) pairs in devices order and a list of (device hostname/ip, error) pairs for failed devices.
+    '''
+    processes = processes or os.cpu_count() or 1
+    shards = make_shards(list(devices), processes)
+    results = []
+    errors = []
+    with ProcessPoolExecutor(max_workers = len(shards) or 1) as executor:
+        futures = [executor.submit(run_shard, function, shard, args, threads) for shard in shards]
+        for shard, future in zip(shards, futures):
+            for device, (success, value) in zip(shard, future.result()):
+                if success:
+                    results.append((device, value))
+                else:
+                    errors.append((device_name(device), value))
+    return results, errors
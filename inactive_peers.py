@@ -1,57 +1,226 @@
 # How to collect information about bgp sessions which are inactive more than one week from one Arista device using Python.
+# With --watch SECONDS option all devices from devices.yaml(see inventory.py) are polled every SECONDS seconds instead of one device.
+# The state of every inactive peer is kept in memory(PeerIndex) by (device, peer) key with uptime in seconds, so only changes are printed
+# as JSON lines: a peer went down, changed its state, came back(disappeared from "exclude Estab" output) or crossed --days threshold.
+# Sessions stay open between polls(session_pool.py). Peers which are down longer than --days are printed from the index, without polling,
+# after each poll with --report option and at any moment by "kill -USR1 <pid>".
+# Devices with "transport: eapi"(see eapi.py) are polled with JSON output, so there is no text parsing for them.
+# With --cache option outputs younger than 60 seconds are taken from the local cache(show_cache.py).
 
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from netmiko import ConnectHandler
+from session_pool import SessionPool, open_session, device_name
+from streaming import as_completed_bounded, write_jsonl
+from bgp_parser import parse_bgp_summary, seconds_to_uptime
+from eapi import EapiConnection, bgp_peers
+from inventory import Inventory
+from show_cache import ShowCache
 from pprint import pprint
-import re
+import argparse
+import signal
+import sys
+import time
 
-device = input('Enter device ip-address or hostname: ')
-
-def send_show_command(device, command):
-    with ConnectHandler(**device) as ssh:
+def send_show_command(device, command, pool = None, cache = None):
+    if cache is not None:
+        output = cache.get(device, command)
+        if output is not None:
+            return output
+    with open_session(device, pool) as ssh:
         output = ssh.send_command(command)
+    if cache is not None:
+        cache.put(device, command, output)
     return output
 
+def collect_peers(device, command, pool = None, cache = None):
+    '''
+    Allows to get bgp peers of one device: from JSON output for eAPI sessions(see eapi.bgp_peers), from the parsed text output for all others.
+    If cache(show_cache.ShowCache) is given, the text output is taken from it or gathered and saved with send_show_command.
+    '''
+    if cache is not None:
+        return parse_bgp_summary(send_show_command(device, command, pool, cache))
+    with open_session(device, pool) as ssh:
+        if isinstance(ssh, EapiConnection):
+            return bgp_peers(ssh, command)[0]
+        return parse_bgp_summary(ssh.send_command(command))
+
+class PeerIndex:
+    '''
+    Variables:
+    peers - dictionary with (device, peer ip) as key and {"description", "as", "state", "uptime_seconds", "polled"} as value.
+    thresholds - list of uptimes in seconds, crossing of each of them is reported once.
+    unreachable - set of devices which failed on the last poll, their peers are kept as they were.
+    '''
+    def __init__(self, thresholds = (7 * 86400,)):
+        self.peers = {}
+        self.thresholds = sorted(thresholds)
+        self.unreachable = set()
+
+    def uptime(self, key, now = None):
+        '''
+        Allows to get the current uptime of the peer: the uptime from the last poll plus the time since it.
+        '''
+        values = self.peers[key]
+        if values["uptime_seconds"] is None:
+            return None
+        return values["uptime_seconds"] + (now or time.time()) - values["polled"]
+
+    def event(self, name, key, now, **values):
+        device, ip = key
+        event = {"time": int(now), "event": name, "device": device, "peer": ip}
+        event.update(values)
+        return event
+
+    def update(self, device, peers, now = None):
+        '''
+        Allows to update the index with inactive peers of one device and to get a list of events:
+        down - new inactive peer, state - state changed, up - peer is not inactive anymore, threshold - uptime crossed a threshold.
+        '''
+        now = now or time.time()
+        events = []
+        if device in self.unreachable:
+            self.unreachable.discard(device)
+            events.append({"time": int(now), "event": "reachable", "device": device})
+        seen = set()
+        for peer in peers:
+            key = (device, peer.ip)
+            seen.add(key)
+            previous = self.peers.get(key)
+            self.peers[key] = {"description": peer.description, "as": peer.asn, "state": peer.state,
+                               "uptime_seconds": peer.uptime_seconds, "polled": now}
+            if previous is None:
+                events.append(self.event("down", key, now, state = peer.state, uptime = peer.uptime))
+                continue
+            if previous["state"] != peer.state:
+                events.append(self.event("state", key, now, previous = previous["state"], state = peer.state, uptime = peer.uptime))
+            before = previous["uptime_seconds"]
+            if before is not None and peer.uptime_seconds is not None:
+                for threshold in self.thresholds:
+                    if before < threshold <= peer.uptime_seconds:
+                        events.append(self.event("threshold", key, now, state = peer.state, uptime = peer.uptime,
+                                                 threshold = seconds_to_uptime(threshold)))
+        for key in [key for key in self.peers if key[0] == device and key not in seen]:
+            previous = self.peers.pop(key)
+            events.append(self.event("up", key, now, previous = previous["state"]))
+        return events
+
+    def failed(self, device, error, now = None):
+        '''
+        Allows to mark the device as unreachable, the event is returned only when the device was reachable before.
+        '''
+        if device in self.unreachable:
+            return []
+        self.unreachable.add(device)
+        return [{"time": int(now or time.time()), "event": "unreachable", "device": device, "error": error}]
+
+    def down_longer_than(self, seconds, now = None):
+        '''
+        Allows to get peers which are inactive longer than seconds from the index, the longest first.
+        '''
+        now = now or time.time()
+        result = []
+        for key, values in self.peers.items():
+            uptime = self.uptime(key, now)
+            if uptime is not None and uptime >= seconds:
+                result.append({"device": key[0], "peer": key[1], "description": values["description"], "as": values["as"],
+                               "state": values["state"], "uptime": seconds_to_uptime(uptime)})
+        return sorted(result, key = lambda values: self.uptime((values["device"], values["peer"]), now), reverse = True)
+
+def poll(devices, command, index, limit, pool = None, cache = None):
+    '''
+    Allows to poll all devices once and to get a list of index events.
+    '''
+    collect = lambda device: collect_peers(device, command, pool, cache)
+    events = []
+    for device, future in as_completed_bounded(collect, devices, limit):
+        try:
+            peers = future.result()
+        except Exception as error:
+            events += index.failed(device_name(device), repr(error))
+            continue
+        events += index.update(device_name(device), peers)
+    return events
+
+def watch(devices, command, interval, days, limit = 20, report = False, cache = None):
+    '''
+    Allows to poll devices every interval seconds and to print index events as JSON lines.
+    '''
+    index = PeerIndex(thresholds = [day * 86400 for day in days])
+    print_report = lambda *args: write_jsonl(index.down_longer_than(min(days) * 86400), sys.stderr)
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, print_report)
+    with SessionPool(idle_timeout = max(300, 2 * interval)) as pool:
+        while True:
+            start = time.monotonic()
+            write_jsonl(poll(devices, command, index, limit, pool, cache))
+            if report:
+                print_report()
+            pool.evict_idle()
+            time.sleep(max(interval - (time.monotonic() - start), 0))
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="poll all devices from devices.yaml every SECONDS seconds")
+    parser.add_argument("--days", type=float, nargs="+", default=[7], help="thresholds in days")
+    parser.add_argument("--report", action="store_true", help="print peers down longer than --days to stderr after each poll")
+    parser.add_argument("--site")
+    parser.add_argument("--role")
+    parser.add_argument("--platform")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--cache", action="store_true", help="use cached outputs of previous runs")
+    args = parser.parse_args()
+    cache = ShowCache() if args.cache else None
+    if args.watch:
+        devices = Inventory.load('devices.yaml').select(site = args.site, role = args.role, platform = args.platform)
+        try:
+            watch(devices, "sh ip bgp summary | exclude Estab", args.watch, args.days, limit = args.limit, report = args.report, cache = cache)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if cache is not None:
+                cache.close()
+        sys.exit()
+    device = input('Enter device ip-address or hostname: ')
     device = {
         "device_type": "arista_eos",
         "ip": device,
         "username": "username",
         "password": "password",
     }
-    output = send_show_command(device, "sh ip bgp summary | exclude Estab")
-    regex = (r'(?P<description>.*?)\s+(?P<ip>\S+)\s+\d\s+(?P<as>\S+)(?:\s+\d+\s+){4}(?P<uptime>\S+)\s+(?P<state>\S+)')
+    peers = collect_peers(device, "sh ip bgp summary | exclude Estab", cache = cache)
+    if cache is not None:
+        print(cache.stats(), file=sys.stderr)
+        cache.close()
     # Arista uses below type of "show ip bgp summary" command output:
     # Description              Neighbor         V  AS           MsgRcvd   MsgSent  InQ OutQ  Up/Down State   PfxRcd PfxAcc
     # BGP-PEER                 12.34.56.78      4  12345              0         0    0    0   10d00h Idle(Admin)         
-    result = re.finditer(regex, output)
+    # The output is parsed with bgp_parser, uptime is converted to seconds(values like "00:12:34" are less than one day).
     pprint('-'*45)
-    for match in result:
-        uptime = match['uptime']
-        if ":" in uptime:
-            pass
-        else:
-            days, hours = uptime.split('d')
-            if int(days) >= 7:
-                pprint(match.groupdict(), sort_dicts=False)
-                pprint('-'*45)
+    for peer in peers:
+        if peer.uptime_seconds is not None and peer.uptime_seconds >= min(args.days) * 86400:
+            pprint(peer.as_dict(), sort_dicts=False)
+            pprint('-'*45)
 
 
 # The result should be something like this:
 #  % ./inactive_peers.py  
 # Enter device ip-address or hostname: test-switch
 # '---------------------------------------------'
-# {'description': '  BGP-PEER',
+# {'description': 'BGP-PEER',
 #  'ip': '12.34.56.78',
 #  'as': '12345',
 #  'uptime': '10d00h',
 #  'state': 'Idle(Admin)'}
 # '---------------------------------------------'
-# {'description': '  BGP-PEERt',
+# {'description': 'BGP-PEERt',
 #  'ip': '87.65.43.21',
 #  'as': '54321',
 #  'uptime': '10d10h',
 #  'state': 'Active'}
 # '---------------------------------------------'
+#  % ./inactive_peers.py --watch 300 --days 7 30
+# {"time": 1760781600, "event": "down", "device": "edge-switch-1", "peer": "12.34.56.78", "state": "Idle(Admin)", "uptime": "1w3d"}
+# {"time": 1760781600, "event": "down", "device": "edge-switch-2", "peer": "87.65.43.21", "state": "Active", "uptime": "00:04:10"}
+# {"time": 1760781900, "event": "state", "device": "edge-switch-2", "peer": "87.65.43.21", "previous": "Active", "state": "Idle", "uptime": "00:09:10"}
+# {"time": 1760785500, "event": "up", "device": "edge-switch-2", "peer": "87.65.43.21", "previous": "Idle"}
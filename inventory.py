@@ -0,0 +1,101 @@
+# Inventory of devices from devices.yaml with indexes by site, role and platform.
+# yaml file is parsed only when it has changed, the parsed list of devices is kept next to it in a binary(marshal) file.
+# The binary file has credentials from yaml file, so it is readable only by its owner and it is not loaded if it belongs to another user.
+# Besides connection parameters every device can have site, role, platform(device_type by default) and aaa(TACACS/RADIUS server) keys:
+# - device_type: arista_eos
+#   ip: edge-switch-1
+#   username: <username>
+#   password: <password>
+#   site: ams1
+#   role: edge
+#   aaa: tacacs-1
+# Usage:
+# inventory = Inventory.load('devices.yaml')
+# devices = inventory.select(site = "ams1", role = "edge")
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import marshal
+import os
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+INVENTORY_KEYS = ("site", "role", "platform", "aaa")
+
+def connection_params(device):
+    '''
+    Allows to remove inventory keys from the device, so only connection parameters are passed to ConnectHandler.
+    '''
+    return {key: value for key, value in device.items() if key not in INVENTORY_KEYS}
+
+class Inventory:
+    '''
+    Variables:
+    devices - list of devices in yaml file order.
+    indexes - dictionary with inventory key as key and {value: list of devices positions} as value.
+    '''
+    def __init__(self, devices):
+        self.devices = devices
+        self.indexes = {key: {} for key in INVENTORY_KEYS}
+        for position, device in enumerate(devices):
+            for key in INVENTORY_KEYS:
+                value = device.get(key, device.get("device_type") if key == "platform" else None)
+                self.indexes[key].setdefault(value, []).append(position)
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __iter__(self):
+        return iter(self.devices)
+
+    @classmethod
+    def load(cls, path = "devices.yaml", cache_path = None):
+        '''
+        Allows to load the inventory from the binary cache if yaml file hasn't changed since the cache was made, otherwise from yaml file.
+        marshal is used instead of pickle, so loading the cache can't run any code. The cache is written to a temporary file with 0600 mode
+        and renamed, so it is never readable by other users, even for a moment. Values which marshal doesn't support(for example dates) disable the cache.
+        '''
+        cache_path = cache_path or path + ".marshal"
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        try:
+            with open(cache_path, "rb") as f:
+                if hasattr(os, "getuid") and os.fstat(f.fileno()).st_uid != os.getuid():
+                    raise PermissionError(f"{cache_path} belongs to another user")
+                cached_stamp, devices = marshal.load(f)
+            if cached_stamp == stamp:
+                return cls(devices)
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+        with open(path) as f:
+            devices = yaml.load(f, Loader=SafeLoader) or []
+        temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with os.fdopen(os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+                marshal.dump((stamp, devices), f)
+            os.replace(temporary_path, cache_path)
+        except (OSError, ValueError):
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+        return cls(devices)
+
+    def select(self, **filters):
+        '''
+        Allows to get devices which match all filters, for example select(site = "ams1", role = "edge"). None values are ignored.
+        '''
+        positions = None
+        for key, value in filters.items():
+            if value is None:
+                continue
+            found = set(self.indexes[key].get(value, ()))
+            positions = found if positions is None else positions & found
+        if positions is None:
+            return list(self.devices)
+        return [self.devices[position] for position in sorted(positions)]
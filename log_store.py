@@ -0,0 +1,149 @@
+# Local append-only store of device log lines, so log history of a bgp peer is answered locally instead of "show logging | in <peer>" on the device.
+# For every device the timestamp of the newest stored line(cursor) is kept. The first fetch reads the whole log buffer,
+# next fetches read only "show logging last N seconds"(N is the time since the previous fetch plus overlap) and only lines newer than the cursor are added.
+# Lines are kept in one sqlite file and indexed by peer ip-address(every IPv4 address in the line) and by message type(for example %BGP-5-PEER_CLEAR).
+# Both timestamp formats are understood: "2026-10-18T10:00:01.336068+00:00 switch ..." and "Oct 18 10:00:01 switch ...".
+# Usage:
+# with LogStore() as store:
+#     with open_session(device) as ssh:
+#         store.fetch(device, ssh)
+#     for device_name, timestamp, message_type, line in store.history("12.34.56.78", message_type = "%BGP-5-PEER_CLEAR"):
+#         print(line)
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from session_pool import device_name
+from capture import capture_command
+from datetime import datetime, timezone
+import calendar
+import re
+import sqlite3
+import threading
+import time
+
+MESSAGE_TYPE_REGEX = re.compile(r'%[A-Z0-9_]+-\d-[A-Z0-9_]+')
+IP_REGEX = re.compile(r'(?<![\d.])(?:\d{1,3}\.){3}\d{1,3}(?![\d.])')
+ISO_TIMESTAMP_REGEX = re.compile(r'\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(?:\.\d+)?(?:[+-]\d\d:\d\d|Z)?')
+SYSLOG_TIMESTAMP_REGEX = re.compile(r'([A-Z][a-z]{2}) +(\d{1,2}) (\d\d):(\d\d):(\d\d)')
+MONTHS = {name: number for number, name in enumerate(calendar.month_abbr) if name}
+
+def log_timestamp(line, now = None):
+    '''
+    Allows to get the timestamp of the log line in seconds since the epoch or None if the line doesn't begin with a timestamp.
+    Syslog timestamps have no year and time zone: the current year(the previous one for dates in the future) and UTC are used.
+    '''
+    match = ISO_TIMESTAMP_REGEX.match(line)
+    if match:
+        value = datetime.fromisoformat(match.group().replace("Z", "+00:00"))
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    match = SYSLOG_TIMESTAMP_REGEX.match(line)
+    if not match or match.group(1) not in MONTHS:
+        return None
+    now = now or time.time()
+    year = time.gmtime(now).tm_year
+    month, day, hour, minute, second = MONTHS[match.group(1)], *map(int, match.groups()[1:])
+    timestamp = calendar.timegm((year, month, day, hour, minute, second))
+    if timestamp > now + 86400:
+        timestamp = calendar.timegm((year - 1, month, day, hour, minute, second))
+    return float(timestamp)
+
+class LogStore:
+    '''
+    Variables:
+    path - sqlite file of the store.
+    overlap - seconds added to the "show logging last" window, so lines are not lost because of delays and clock differences.
+    '''
+    def __init__(self, path = "log_store.sqlite", overlap = 60):
+        self.overlap = overlap
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS logs (id INTEGER PRIMARY KEY, device TEXT, timestamp REAL, type TEXT, line TEXT, "
+                         "UNIQUE (device, timestamp, line))")
+        self._db.execute("CREATE TABLE IF NOT EXISTS peers (peer TEXT, log_id INTEGER)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS cursors (device TEXT PRIMARY KEY, timestamp REAL, fetched REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS peers_peer ON peers (peer)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS logs_type ON logs (type, timestamp)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def cursor(self, device):
+        '''
+        Allows to get (timestamp of the newest stored line, time of the last fetch) of the device or (None, None).
+        '''
+        with self._lock:
+            row = self._db.execute("SELECT timestamp, fetched FROM cursors WHERE device = ?", (device_name(device),)).fetchone()
+        return row or (None, None)
+
+    def command(self, device, now = None):
+        '''
+        Allows to get the command which reads only lines newer than the previous fetch.
+        '''
+        timestamp, fetched = self.cursor(device)
+        if fetched is None:
+            return "show logging"
+        return f"show logging last {int((now or time.time()) - fetched + self.overlap)} seconds"
+
+    def append(self, device, output, now = None):
+        '''
+        Allows to add lines newer than the cursor from the output and to move the cursor. The number of added lines is returned.
+        '''
+        return self.append_lines(device, output.splitlines(), now)
+
+    def append_lines(self, device, lines, now = None):
+        '''
+        The same as append for any iterable of lines. Lines without a timestamp(for example wrapped ones) are skipped.
+        '''
+        now = now or time.time()
+        name = device_name(device)
+        added = 0
+        with self._lock, self._db:
+            row = self._db.execute("SELECT timestamp FROM cursors WHERE device = ?", (name,)).fetchone()
+            cursor = row[0] if row and row[0] is not None else float("-inf")
+            newest = cursor
+            for line in lines:
+                timestamp = log_timestamp(line, now)
+                if timestamp is None or timestamp < cursor:
+                    continue
+                match = MESSAGE_TYPE_REGEX.search(line)
+                inserted = self._db.execute("INSERT OR IGNORE INTO logs (device, timestamp, type, line) VALUES (?, ?, ?, ?)",
+                                            (name, timestamp, match.group() if match else None, line))
+                if not inserted.rowcount:
+                    continue
+                added += 1
+                newest = max(newest, timestamp)
+                self._db.executemany("INSERT INTO peers VALUES (?, ?)", [(ip, inserted.lastrowid) for ip in set(IP_REGEX.findall(line))])
+            self._db.execute("INSERT OR REPLACE INTO cursors VALUES (?, ?, ?)", (name, newest if newest != float("-inf") else None, now))
+        return added
+
+    def fetch(self, device, ssh):
+        '''
+        Allows to read new log lines of the device through the open session and to add them to the store.
+        The output is captured in chunks(see capture.py), big log buffers are kept in a temporary file instead of memory until they are stored.
+        '''
+        now = time.time()
+        with capture_command(ssh, self.command(device, now), device = device_name(device)) as capture:
+            return self.append_lines(device, capture.lines(), now)
+
+    def history(self, peer, device = None, message_type = None, since = None):
+        '''
+        Allows to get (device, timestamp, message type, line) of all stored lines with the peer ip-address, the oldest first.
+        '''
+        query = "SELECT logs.device, logs.timestamp, logs.type, logs.line FROM peers JOIN logs ON logs.id = peers.log_id WHERE peers.peer = ?"
+        values = [peer]
+        for condition, value in (("logs.device = ?", device_name(device) if isinstance(device, dict) else device),
+                                 ("logs.type = ?", message_type), ("logs.timestamp >= ?", since)):
+            if value is not None:
+                query += " AND " + condition
+                values.append(value)
+        with self._lock:
+            return self._db.execute(query + " ORDER BY logs.timestamp", values).fetchall()
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,152 @@
+# Adaptive scheduler for fleet runs instead of a fixed max_workers.
+# The number of simultaneous sessions is changed like TCP congestion window(AIMD): it grows by one per "round" while devices answer
+# faster than latency_target, and is halved on errors or slow answers(not more than once per round).
+# Devices can have site and aaa keys in the inventory, site_limits/aaa_limits cap simultaneous sessions per site and per TACACS/RADIUS server.
+# Transient errors(timeouts, refused/reset connections, ssh errors except authentication) are retried with jittered exponential backoff,
+# devices which still fail are returned separately instead of stopping the whole run.
+# Usage:
+# scheduler = AdaptiveScheduler(initial = 10, max_limit = 200, site_limits = {"ams1": 50}, aaa_limits = {"tacacs-1": 20})
+# Scripts take the caps from --site-limit SITE=N and --aaa-limit SERVER=N options(see limit_option), for example:
+# ./find_ip.py --adaptive --site-limit ams1=50 --aaa-limit tacacs-1=20 --aaa-limit tacacs-2=20
+# results, failures = scheduler.run(collect_inactive_peers, devices, args = (command,))
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque
+import heapq
+import itertools
+import paramiko
+import random
+import threading
+import time
+
+def is_transient(error):
+    '''
+    Allows to decide whether the error is worth a retry: wrong credentials are not, timeouts and connection problems are.
+    '''
+    if isinstance(error, paramiko.AuthenticationException):
+        return False
+    return isinstance(error, (OSError, EOFError, TimeoutError, paramiko.SSHException))
+
+def limit_option(value):
+    '''
+    Allows to parse "NAME=N" value of --site-limit/--aaa-limit options to (name, N), a list of such pairs is turned into site_limits/aaa_limits with dict().
+    '''
+    name, separator, number = value.rpartition("=")
+    if not separator or not name or int(number) < 1:
+        raise ValueError(value)
+    return name, int(number)
+
+def device_key(device, key):
+    if isinstance(device, dict):
+        return device.get(key)
+    return None
+
+class AdaptiveScheduler:
+    '''
+    Variables:
+    initial/min_limit/max_limit - initial, minimal and maximal number of simultaneous sessions.
+    latency_target - answers slower than this number of seconds are treated as overload.
+    site_limits/aaa_limits - dictionaries with site/aaa server as key and maximum number of simultaneous sessions as value.
+    retries - number of retries of transient errors, backoff/max_backoff - base and maximal delay before a retry in seconds.
+    limit - current number of simultaneous sessions.
+    '''
+    def __init__(self, initial = 10, min_limit = 1, max_limit = 200, latency_target = 10.0, site_limits = None, aaa_limits = None,
+                 retries = 3, backoff = 1.0, max_backoff = 30.0, is_transient = is_transient):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.site_limits = site_limits or {}
+        self.aaa_limits = aaa_limits or {}
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.is_transient = is_transient
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def on_success(self, started, latency):
+        if latency > self.latency_target:
+            self.on_overload(started)
+            return
+        with self._lock:
+            self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+
+    def on_overload(self, started):
+        '''
+        Multiplicative decrease, only tasks started after the previous decrease can trigger the next one.
+        '''
+        with self._lock:
+            if started > self._last_decrease:
+                self.limit = max(self.limit / 2, self.min_limit)
+                self._last_decrease = time.monotonic()
+
+    def retry_delay(self, attempt):
+        '''
+        Allows to get a "full jitter" delay: a random value between 0 and the exponential backoff.
+        '''
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _has_capacity(self, device, sites, aaa_servers):
+        site = device_key(device, "site")
+        aaa = device_key(device, "aaa")
+        if site in self.site_limits and sites.get(site, 0) >= self.site_limits[site]:
+            return False
+        if aaa in self.aaa_limits and aaa_servers.get(aaa, 0) >= self.aaa_limits[aaa]:
+            return False
+        return True
+
+    def run(self, function, devices, args = ()):
+        '''
+        Allows to run function(device, *args) on all devices and return a list of (device, result) pairs in order of completion
+        and a list of (device, error) pairs for devices which failed after all retries.
+        '''
+        pending = deque((device, 0) for device in devices)
+        delayed = []
+        running = {}
+        sites = {}
+        aaa_servers = {}
+        results = []
+        failures = []
+        counter = itertools.count()
+        with ThreadPoolExecutor(max_workers = self.max_limit) as executor:
+            while pending or delayed or running:
+                now = time.monotonic()
+                while delayed and delayed[0][0] <= now:
+                    ready, number, device, attempt = heapq.heappop(delayed)
+                    pending.append((device, attempt))
+                blocked = []
+                while pending and len(running) < int(self.limit):
+                    device, attempt = pending.popleft()
+                    if not self._has_capacity(device, sites, aaa_servers):
+                        blocked.append((device, attempt))
+                        continue
+                    for counts, key in ((sites, "site"), (aaa_servers, "aaa")):
+                        value = device_key(device, key)
+                        counts[value] = counts.get(value, 0) + 1
+                    running[executor.submit(function, device, *args)] = (device, attempt, time.monotonic())
+                pending.extendleft(reversed(blocked))
+                timeout = max(delayed[0][0] - now, 0) if delayed else None
+                if not running:
+                    time.sleep(timeout or 0)
+                    continue
+                done, not_done = wait(running, timeout = timeout, return_when = FIRST_COMPLETED)
+                for future in done:
+                    device, attempt, started = running.pop(future)
+                    for counts, key in ((sites, "site"), (aaa_servers, "aaa")):
+                        counts[device_key(device, key)] -= 1
+                    error = future.exception()
+                    if error is None:
+                        self.on_success(started, time.monotonic() - started)
+                        results.append((device, future.result()))
+                        continue
+                    self.on_overload(started)
+                    if self.is_transient(error) and attempt < self.retries:
+                        ready = time.monotonic() + self.retry_delay(attempt)
+                        heapq.heappush(delayed, (ready, next(counter), device, attempt + 1))
+                    else:
+                        failures.append((device, repr(error)))
+        return results, failures
@@ -0,0 +1,149 @@
+# A keyed pool of ssh sessions which can be shared by all scripts within one run.
+# Instead of doing a fresh ConnectHandler(TCP, SSH and authentication) for every show and config command, a session is taken from the pool,
+# used and returned back, so one authenticated session serves all commands for one device.
+# Usage:
+# with SessionPool() as pool:
+#     with pool.session(device) as ssh:
+#         output = ssh.send_command("show version")
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from contextlib import contextmanager
+from netmiko import ConnectHandler
+from eapi import EapiConnection
+from inventory import connection_params
+import threading
+import time
+
+def connect(device):
+    '''
+    Allows to open a new session to the device: eAPI for devices with "transport: eapi", ssh(netmiko) for all others.
+    Inventory keys(site, role, etc.) are not passed to the connection.
+    '''
+    params = connection_params(device)
+    if params.get("transport") == "eapi":
+        return EapiConnection(**params)
+    return ConnectHandler(**params)
+
+def open_session(device, pool = None):
+    '''
+    Allows to use the same "with" statement with or without a pool: without a pool a new session is opened and disconnected after use.
+    '''
+    if pool is None:
+        return connect(device)
+    return pool.session(device)
+
+def device_name(device):
+    '''
+    Allows to get the device hostname/ip address from the device parameters.
+    '''
+    return device.get("host") or device.get("ip")
+
+def session_key(device):
+    '''
+    Allows to make a pool key from the device parameters, sessions are shared only between identical devices and credentials.
+    '''
+    return (device.get("device_type"), device_name(device), device.get("port"), device.get("username"))
+
+class SessionPool:
+    '''
+    Keeps idle sessions per device.
+    Variables:
+    max_per_device - maximum number of simultaneous sessions to one device, other threads wait until a session is released.
+    idle_timeout - idle sessions older than this number of seconds are disconnected.
+    connect - function which opens a new session.
+    '''
+    def __init__(self, max_per_device = 1, idle_timeout = 300, connect = connect):
+        self.max_per_device = max_per_device
+        self.idle_timeout = idle_timeout
+        self.connect = connect
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._slots = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _slot(self, key):
+        with self._lock:
+            if key not in self._slots:
+                self._slots[key] = threading.BoundedSemaphore(self.max_per_device)
+            return self._slots[key]
+
+    def _checkout(self, key, device):
+        self.evict_idle()
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                if not idle:
+                    break
+                ssh, last_used = idle.pop()
+            if self._is_alive(ssh):
+                return ssh
+            self._disconnect(ssh)
+        return self.connect(device)
+
+    def _checkin(self, key, ssh):
+        with self._lock:
+            self._idle.setdefault(key, []).append((ssh, time.monotonic()))
+
+    @staticmethod
+    def _is_alive(ssh):
+        try:
+            return ssh.is_alive()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _disconnect(ssh):
+        try:
+            ssh.disconnect()
+        except Exception:
+            pass
+
+    @contextmanager
+    def session(self, device):
+        '''
+        Allows to take a healthy session to the device from the pool(or to open a new one) and to return it back after use.
+        If an exception occurs during the session usage, the session is disconnected instead of returning to the pool.
+        '''
+        key = session_key(device)
+        slot = self._slot(key)
+        slot.acquire()
+        try:
+            ssh = self._checkout(key, device)
+            try:
+                yield ssh
+            except Exception:
+                self._disconnect(ssh)
+                raise
+            self._checkin(key, ssh)
+        finally:
+            slot.release()
+
+    def evict_idle(self):
+        '''
+        Allows to disconnect sessions which have been idle longer than idle_timeout.
+        '''
+        deadline = time.monotonic() - self.idle_timeout
+        expired = []
+        with self._lock:
+            for key, idle in self._idle.items():
+                expired.extend(ssh for ssh, last_used in idle if last_used < deadline)
+                idle[:] = [(ssh, last_used) for ssh, last_used in idle if last_used >= deadline]
+        for ssh in expired:
+            self._disconnect(ssh)
+
+    def close(self):
+        '''
+        Allows to disconnect all idle sessions.
+        '''
+        with self._lock:
+            idle = [ssh for sessions in self._idle.values() for ssh, last_used in sessions]
+            self._idle.clear()
+        for ssh in idle:
+            self._disconnect(ssh)
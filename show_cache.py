@@ -0,0 +1,102 @@
+# On-disk cache of show commands outputs, so repeated runs don't poll the same devices for the same commands again.
+# Entries are kept in one sqlite file, outputs are compressed with zlib.
+# Every command has its own time to live(the longest matching command prefix from ttls is used), when the cache is bigger than max_entries,
+# least recently used entries are deleted. send_config_commands invalidates all entries of the device it has configured.
+# Entries are kept per host, port and username(see cache_key), so devices behind one host never get each other's outputs.
+# Usage:
+# with ShowCache(ttls = {"show ip bgp summary": 30}) as cache:
+#     output = send_show_command(device, "show ip bgp summary", cache = cache)
+#     print(cache.stats())
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from session_pool import session_key
+import sqlite3
+import threading
+import time
+import zlib
+
+def cache_key(device):
+    '''
+    Allows to make the device value of cache entries from device_type, host/ip address, port and username(see session_pool.session_key).
+    '''
+    return "|".join("" if value is None else str(value) for value in session_key(device))
+
+class ShowCache:
+    '''
+    Variables:
+    path - sqlite file of the cache.
+    ttls - dictionary with command(or command prefix) as key and time to live in seconds as value.
+    default_ttl - time to live for commands which are not in ttls.
+    max_entries - maximum number of cached outputs.
+    hits/misses - number of found and not found(or expired) entries since the cache was opened.
+    '''
+    def __init__(self, path = "show_cache.sqlite", ttls = None, default_ttl = 60, max_entries = 10000):
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS cache (device TEXT, command TEXT, created REAL, used REAL, output BLOB, "
+                         "PRIMARY KEY (device, command))")
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_used ON cache (used)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def ttl(self, command):
+        '''
+        Allows to get time to live of the command: the value of the longest matching prefix from ttls or default_ttl.
+        '''
+        prefixes = [prefix for prefix in self.ttls if command.startswith(prefix)]
+        if not prefixes:
+            return self.default_ttl
+        return self.ttls[max(prefixes, key=len)]
+
+    def get(self, device, command):
+        '''
+        Allows to get a cached output or None if there is no entry or it has expired.
+        '''
+        key = (cache_key(device), command)
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute("SELECT created, output FROM cache WHERE device = ? AND command = ?", key).fetchone()
+            if row is None or row[0] + self.ttl(command) < now:
+                if row is not None:
+                    self._db.execute("DELETE FROM cache WHERE device = ? AND command = ?", key)
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE cache SET used = ? WHERE device = ? AND command = ?", (now,) + key)
+            self.hits += 1
+        return zlib.decompress(row[1]).decode()
+
+    def put(self, device, command, output):
+        '''
+        Allows to save an output and to delete least recently used entries above max_entries.
+        '''
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                             (cache_key(device), command, now, now, zlib.compress(output.encode())))
+            self._db.execute("DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                             (self.max_entries,))
+
+    def invalidate(self, device):
+        '''
+        Allows to delete all cached outputs of the device, for example after its configuration was changed.
+        '''
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM cache WHERE device = ?", (cache_key(device),))
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / total if total else 0.0}
+
+    def close(self):
+        self._db.close()
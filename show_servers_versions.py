@@ -5,34 +5,217 @@
 # string among all information there, make a note and finally log out from device.
 # Instead of doing all this actions a python script can be used.
 # It takes about 6 seconds to execute all this steps on 25 servers.
+# For large fleets there is also an asyncio mode (./show_servers_versions.py --async), it needs the asyncssh package.
+# It waits for the shell prompt or the "VERSION=" string instead of sleeping, so every server costs about one round-trip per step
+# and thousands of servers can be in flight on one event loop without a thread per server.
+# With --exec option every server gets exactly one command on an exec channel(no shell, no sleeps): VERSION of every running docker container
+# is read at once and the whole output is received, not only the first 1000 bytes. Results are aggregated into a version -> [(server, container)] index
+# and with --target VERSION a drift report shows all containers which are not on the target version: ./show_servers_versions.py --exec --target 1.2.03
+# The path of the file with VERSION inside containers is given with --version-file: ./show_servers_versions.py --exec --version-file /app/version.txt
+# With --adaptive option servers are run by scheduler.py instead of the fixed 25 threads: the number of sessions follows servers answers,
+# servers which drop the connection are retried and the ones which still fail are printed at the end instead of stopping the script.
+# Servers in the list have no inventory keys, with --aaa-limit N all of them are treated as users of one TACACS/RADIUS server:
+# no more than N sessions are opened at once, whatever the adaptive number of sessions is.
 
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import paramiko
 import time
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pprint import pprint
 import re
+import argparse
+import asyncio
+from scheduler import AdaptiveScheduler
+from capture import Capture
+import codecs
+import shlex
+import socket
 
-def gather_output(device):
+try:
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+PROMPT_REGEX = re.compile(r'[#$]\s*$')
+ROOT_PROMPT_REGEX = re.compile(r'#\s*$')
+VERSION_OR_PROMPT_REGEX = re.compile(r'VERSION=\S+\s|[#$]\s*$')
+VERSION_REGEX = re.compile(r'VERSION=(\S+)')
+VERSION_FILE = "<file_where_firmware_information_resides>"
+
+def containers_version_command(version_file = VERSION_FILE):
+    '''
+    Allows to make the exec channel command which prints one line per running container: "<container> VERSION=<version>",
+    only "<container> " if there is no VERSION in the container. version_file is the path inside containers, it is quoted(shlex.quote),
+    so any path is passed to grep as is and never read by the shell as a redirection or another command.
     '''
-    Allows to connect to one device and gather all information from a file which contains a firmware version value.
+    script = ('for container in $(docker ps --format "{{.Names}}"); do '
+              f'echo "$container $(docker exec $container grep -m1 ^VERSION= {shlex.quote(version_file)} 2>/dev/null)"; done')
+    return "sudo -n sh -c " + shlex.quote(script)
+
+def gather_output(device, username = "name", port = 22, password = None, timeout = 10):
+    '''
+    Allows to connect to one device and gather the line with a firmware version value from a file.
     <file_where_firmware_information_resides> is .txt file with dozens strings among which there is one with firmware version and it begins with "VERSION"
-    I don't use password as credentials because I have key authentication on my servers.
+    The file is read in chunks until the prompt after it(or timeout seconds without data), only lines with "VERSION=" are kept(see capture.py).
+    I don't use password as credentials because I have key authentication on my servers(password is only for servers without keys, for example simulated ones).
     '''
     client = paramiko.SSHClient()
     client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    client.connect(hostname=device, username="name", port="22")
+    client.connect(hostname=device, username=username, port=port, password=password)
     ssh = client.invoke_shell()
     ssh.send("sudo su\n")
     time.sleep(1)
-    ssh.send("cd /<path_to_needed_container>")
+    ssh.send("cd /<path_to_needed_container>\n")
     time.sleep(1)
-    ssh.send("cat <file_where_firmware_information_resides>")
+    ssh.send("cat <file_where_firmware_information_resides>\n")
     time.sleep(1)
-    result = ssh.recv(1000).decode("utf-8")
+    version_lines = []
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    capture = Capture([lambda line: VERSION_REGEX.search(line) and version_lines.append(line)], keep_raw = False, hostname = device)
+    ssh.settimeout(timeout)
+    try:
+        while not (version_lines and ROOT_PROMPT_REGEX.search(capture.tail)):
+            chunk = ssh.recv(65536)
+            if not chunk:
+                break
+            capture.feed(decoder.decode(chunk))
+    except socket.timeout:
+        pass
     ssh.close()
+    client.close()
+    return "\n".join(version_lines)
+
+async def read_until(stdout, pattern, timeout):
+    '''
+    Allows to read from the shell until the pattern appears in the output instead of waiting a fixed time after each command.
+    '''
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    output = ''
+    while not pattern.search(output):
+        chunk = await asyncio.wait_for(stdout.read(1000), deadline - loop.time())
+        if not chunk:
+            break
+        output += chunk
+    return output
+
+async def gather_output_async(device, timeout = 10):
+    '''
+    The asyncio version of gather_output. The same steps are done, but every step ends as soon as the prompt(or the "VERSION=" string for the last one)
+    is received, so there are no sleeps and no dedicated thread for the server.
+    '''
+    async with asyncssh.connect(device, username="name", port=22, known_hosts=None) as conn:
+        process = await conn.create_process(term_type="vt100")
+        await read_until(process.stdout, PROMPT_REGEX, timeout)
+        process.stdin.write("sudo su\n")
+        await read_until(process.stdout, ROOT_PROMPT_REGEX, timeout)
+        process.stdin.write("cd /<path_to_needed_container>\n")
+        await read_until(process.stdout, PROMPT_REGEX, timeout)
+        process.stdin.write("cat <file_where_firmware_information_resides>\n")
+        result = await read_until(process.stdout, VERSION_OR_PROMPT_REGEX, timeout)
+        process.close()
     return result
 
+async def gather_all_async(servers_list, limit):
+    '''
+    Allows to run gather_output_async on all servers on one event loop, limit is a maximum number of simultaneous ssh sessions.
+    Exceptions are returned instead of results, so one unreachable server doesn't stop the others.
+    '''
+    semaphore = asyncio.Semaphore(limit)
+
+    async def gather_one(server):
+        async with semaphore:
+            return await gather_output_async(server)
+
+    return await asyncio.gather(*(gather_one(server) for server in servers_list), return_exceptions=True)
+
+def parse_container_versions(lines):
+    '''
+    Allows to get a dictionary with container name as key and version as value(None if the container has no VERSION) from containers_version_command output.
+    lines can be any iterable of strings, for example the exec channel stdout, which is read line by line.
+    '''
+    versions = {}
+    for line in lines:
+        container, _, rest = line.strip().partition(" ")
+        if container:
+            match = VERSION_REGEX.search(rest)
+            versions[container] = match.group(1) if match else None
+    return versions
+
+def gather_versions_exec(device, username = "name", port = 22, password = None, timeout = 30, version_file = VERSION_FILE):
+    '''
+    Allows to get versions of all running containers of one server with one exec channel command(see containers_version_command).
+    The output is parsed line by line until the command is finished, so it is never truncated and never kept as a whole.
+    If the command fails, RuntimeError is raised.
+    '''
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    client.connect(hostname=device, username=username, port=port, password=password, timeout=timeout)
+    try:
+        stdin, stdout, stderr = client.exec_command(containers_version_command(version_file), timeout=timeout)
+        versions = parse_container_versions(stdout)
+        status = stdout.channel.recv_exit_status()
+        if status:
+            raise RuntimeError(f'exit status {status}: {stderr.read().decode("utf-8").strip()}')
+    finally:
+        client.close()
+    return versions
+
+def build_version_index(results):
+    '''
+    Allows to make a dictionary with version as key and list of (server, container) as value from (server, {container: version}) pairs.
+    Containers without VERSION are under "unknown" key.
+    '''
+    index = {}
+    for server, versions in results:
+        for container, version in versions.items():
+            index.setdefault(version or "unknown", []).append((server, container))
+    for pairs in index.values():
+        pairs.sort()
+    return index
+
+def drift_report(index, target, failures = ()):
+    '''
+    Allows to get a summary of the index against the target version: number of containers on it and all containers on other versions.
+    '''
+    return {
+        "target": target,
+        "containers": sum(len(pairs) for pairs in index.values()),
+        "on_target": len(index.get(target, [])),
+        "drift": {version: pairs for version, pairs in sorted(index.items()) if version != target},
+        "failed": [server for server, error in failures],
+    }
+
+def show_versions_exec(servers_list, target = None, limit = 25, version_file = VERSION_FILE):
+    '''
+    Allows to gather versions of all containers from all servers in parallel using gather_versions_exec and to print the version index
+    and, if target is given, the drift report. Failed servers are printed and skipped.
+    '''
+    results = []
+    failures = []
+    with ThreadPoolExecutor(max_workers = limit) as executor:
+        futures = {executor.submit(gather_versions_exec, server, version_file = version_file): server for server in servers_list}
+        for future in as_completed(futures):
+            server = futures[future]
+            try:
+                results.append((server, future.result()))
+            except Exception as error:
+                failures.append((server, repr(error)))
+                print({server: f'ERROR: {error!r}'})
+    index = build_version_index(results)
+    pprint(index)
+    if target is not None:
+        pprint(drift_report(index, target, failures), sort_dicts=False)
+    return index, failures
+
+def print_version(server, output):
+    data = {}
+    match = re.search('VERSION=(\S+)', output)
+    version = match.group()
+    data[server] = version
+    print(data)
+
 def show_versions(servers_list, limit):
     '''
     Allows to connect to all devices from the list in parallel using the first function, parse only version values and make a dictionary with
@@ -41,15 +224,51 @@ def show_versions(servers_list, limit):
     with ThreadPoolExecutor(max_workers = limit) as executor:
         result = executor.map(gather_output, servers_list)
         for server, output in zip(servers_list, result):
-            data = {}
-            match = re.search('VERSION=(\S+)', output)
-            version = match.group()
-            data[server] = version
-            print(data)
+            print_version(server, output)
+
+def show_versions_adaptive(servers_list, scheduler):
+    '''
+    The same as show_versions, but servers are run by scheduler(scheduler.AdaptiveScheduler) and results are printed in order of completion.
+    '''
+    results, failures = scheduler.run(gather_output, servers_list)
+    for server, output in results:
+        print_version(server, output)
+    for server, error in failures:
+        print({server: f'ERROR: {error}'})
+
+def show_versions_async(servers_list, limit = 1000):
+    '''
+    The same as show_versions, but the information is gathered with gather_all_async.
+    '''
+    if asyncssh is None:
+        raise RuntimeError('asyncssh package is required for the asyncio mode')
+    result = asyncio.run(gather_all_async(servers_list, limit))
+    for server, output in zip(servers_list, result):
+        if isinstance(output, Exception):
+            print({server: f'ERROR: {output!r}'})
+        else:
+            print_version(server, output)
 
 if __name__ == "__main__":
-    servers_list = ["hostname/ip address", "hostname/ip address", "hostname/ip address" ...]
-    show_versions(servers_list, limit = 25)
+    servers_list = ["hostname/ip address", "hostname/ip address", "hostname/ip address"]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--async", dest="use_async", action="store_true", help="asyncio mode, needs asyncssh")
+    parser.add_argument("--adaptive", action="store_true", help="adaptive number of sessions and retries(see scheduler.py)")
+    parser.add_argument("--exec", dest="use_exec", action="store_true", help="one exec channel command per server for all containers")
+    parser.add_argument("--target", help="version for the drift report of --exec mode")
+    parser.add_argument("--version-file", default=VERSION_FILE, help="path of the file with VERSION inside containers for --exec mode")
+    parser.add_argument("--aaa-limit", type=int, metavar="N", help="maximum number of sessions authenticated at once with --adaptive")
+    args = parser.parse_args()
+    if args.use_exec:
+        show_versions_exec(servers_list, target = args.target, limit = 25, version_file = args.version_file)
+    elif args.use_async:
+        show_versions_async(servers_list, limit = 1000)
+    elif args.adaptive:
+        # Servers without aaa key are counted under None key(see scheduler.device_key).
+        aaa_limits = {None: args.aaa_limit} if args.aaa_limit else None
+        show_versions_adaptive(servers_list, AdaptiveScheduler(initial = 25, aaa_limits = aaa_limits))
+    else:
+        show_versions(servers_list, limit = 25)
     
 # The result should be something like this:
 # {'server1': 'VERSION=1.2.03'}
@@ -57,3 +276,13 @@ if __name__ == "__main__":
 # {'server3': 'VERSION=1.2.03'}
 # {'server4': 'VERSION=1.2.02'}
 # ...
+#  % ./show_servers_versions.py --exec --target 1.2.03
+# {'1.2.02': [('server2', 'app-1')],
+#  '1.2.03': [('server1', 'app-1'), ('server1', 'app-2'), ('server2', 'app-2')],
+#  'unknown': [('server1', 'sidecar-0'), ('server2', 'sidecar-0')]}
+# {'target': '1.2.03',
+#  'containers': 6,
+#  'on_target': 3,
+#  'drift': {'1.2.02': [('server2', 'app-1')],
+#            'unknown': [('server1', 'sidecar-0'), ('server2', 'sidecar-0')]},
+#  'failed': []}
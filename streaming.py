@@ -0,0 +1,39 @@
+# Helpers to process results from many devices as soon as each device is finished, instead of waiting for the whole list in input order.
+# Usage:
+# for device, future in as_completed_bounded(collect, devices, limit = 20):
+#     print(future.result())
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+import json
+import sys
+
+def as_completed_bounded(function, items, limit, window = None):
+    '''
+    Allows to run function on all items in a thread pool and to yield (item, future) pairs in order of completion.
+    No more than window items(2 * limit by default) are submitted at once, so only a bounded number of results is kept in memory
+    even for thousands of items. Exceptions are not raised here, they are raised by future.result().
+    '''
+    window = window or 2 * limit
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers = limit) as executor:
+        pending = {executor.submit(function, item): item for item in islice(items, window)}
+        while pending:
+            done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                for next_item in islice(items, 1):
+                    pending[executor.submit(function, next_item)] = next_item
+                yield item, future
+
+def write_jsonl(records, file = None):
+    '''
+    Allows to write records as JSON lines to the file(stdout by default) as soon as each record is received.
+    '''
+    file = file or sys.stdout
+    for record in records:
+        file.write(json.dumps(record) + "\n")
+        file.flush()
@@ -0,0 +1,228 @@
+# Per device and per phase timing of collection runs.
+# install() wraps paramiko and netmiko methods, so every script gets timings without changes in its code:
+# - connect(paramiko SSHClient.connect) and inside it tcp_connect, ssh_handshake and auth;
+# - netmiko_connect(ConnectHandler as a whole, including session preparation);
+# - find_prompt, send_command, send_command_timing, send_config_set(with output size in bytes);
+# - parse(functions decorated with @timed("parse"), for example bgp_parser.parse_bgp_summary, and parsers fed by capture.py);
+# - capture(commands streamed by capture.py without the time of their parsers, with output size in bytes).
+# At the end of the run the report can be saved as JSON and as a Prometheus textfile(for node_exporter textfile collector).
+# Timings are collected only in the current process(not in fleet.py worker processes).
+# paramiko and netmiko are imported only by install(), so parse modules can use @timed without these packages.
+# Usage:
+# recorder = install()
+# ... run collection ...
+# recorder.write_json("timing.json")
+# recorder.write_prometheus("timing.prom")
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from contextlib import contextmanager
+import functools
+import json
+import os
+import threading
+import time
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+NETMIKO_METHODS = ("find_prompt", "send_command", "send_command_timing", "send_config_set")
+
+recorder = None
+_current = threading.local()
+_originals = {}
+
+def current_device():
+    return getattr(_current, "device", None)
+
+class PhaseRecorder:
+    '''
+    Keeps all (device, phase, seconds, bytes) records of the run.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records = []
+
+    def record(self, device, phase, seconds, nbytes = 0):
+        with self._lock:
+            self.records.append((device, phase, seconds, nbytes))
+
+    @contextmanager
+    def phase(self, device, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(device, name, time.perf_counter() - start)
+
+    def report(self):
+        '''
+        Allows to get {device: {phase: {"count": ..., "seconds": ..., "bytes": ...}}} dictionary.
+        '''
+        result = {}
+        with self._lock:
+            records = list(self.records)
+        for device, phase, seconds, nbytes in records:
+            values = result.setdefault(str(device), {}).setdefault(phase, {"count": 0, "seconds": 0.0, "bytes": 0})
+            values["count"] += 1
+            values["seconds"] += seconds
+            values["bytes"] += nbytes
+        return result
+
+    def slowest(self, phase, number = 10):
+        '''
+        Allows to get number of devices with the biggest total time of the phase.
+        '''
+        totals = [(values[phase]["seconds"], device) for device, values in self.report().items() if phase in values]
+        return sorted(totals, reverse=True)[:number]
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def write_prometheus(self, path, buckets = BUCKETS):
+        '''
+        Allows to save latency histograms per phase, output bytes per phase and total time per device and phase in Prometheus text format.
+        The file is written to a temporary file first and then renamed, so the textfile collector never reads a half-written file.
+        '''
+        with self._lock:
+            records = list(self.records)
+        phases = {}
+        for device, phase, seconds, nbytes in records:
+            phases.setdefault(phase, []).append((seconds, nbytes))
+        lines = ["# HELP netauto_phase_duration_seconds Duration of collection phases.",
+                 "# TYPE netauto_phase_duration_seconds histogram"]
+        for phase, values in sorted(phases.items()):
+            for bucket in buckets:
+                count = sum(1 for seconds, nbytes in values if seconds <= bucket)
+                lines.append(f'netauto_phase_duration_seconds_bucket{{phase="{phase}",le="{bucket}"}} {count}')
+            lines.append(f'netauto_phase_duration_seconds_bucket{{phase="{phase}",le="+Inf"}} {len(values)}')
+            lines.append(f'netauto_phase_duration_seconds_sum{{phase="{phase}"}} {sum(seconds for seconds, nbytes in values)}')
+            lines.append(f'netauto_phase_duration_seconds_count{{phase="{phase}"}} {len(values)}')
+        lines += ["# HELP netauto_phase_output_bytes_total Output size of collection phases.",
+                  "# TYPE netauto_phase_output_bytes_total counter"]
+        for phase, values in sorted(phases.items()):
+            lines.append(f'netauto_phase_output_bytes_total{{phase="{phase}"}} {sum(nbytes for seconds, nbytes in values)}')
+        lines += ["# HELP netauto_device_phase_seconds Total time of the phase for the device.",
+                  "# TYPE netauto_device_phase_seconds gauge"]
+        for device, values in sorted(self.report().items()):
+            for phase, phase_values in sorted(values.items()):
+                lines.append(f'netauto_device_phase_seconds{{device="{device}",phase="{phase}"}} {phase_values["seconds"]}')
+        temporary = path + ".tmp"
+        with open(temporary, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temporary, path)
+
+def timed(phase):
+    '''
+    Decorator for parse functions: the time is recorded for the device which is processed in the current thread.
+    Without install() the function is called as is, nested decorated calls(parse_inactive_peers -> parse_bgp_summary) are recorded once.
+    '''
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if recorder is None or getattr(_current, "timed", False):
+                return function(*args, **kwargs)
+            _current.timed = True
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                _current.timed = False
+            nbytes = len(args[0]) if args and isinstance(args[0], str) else 0
+            recorder.record(current_device(), phase, time.perf_counter() - start, nbytes)
+            return result
+        return wrapper
+    return decorator
+
+def _patch(owner, name, make_wrapper):
+    original = getattr(owner, name)
+    _originals[(owner, name)] = original
+    setattr(owner, name, functools.wraps(original)(make_wrapper(original)))
+
+def _wrap_ssh_connect(original):
+    def wrapper(self, hostname, *args, **kwargs):
+        _current.device = hostname
+        _current.handshake = _current.auth = 0.0
+        start = time.perf_counter()
+        try:
+            return original(self, hostname, *args, **kwargs)
+        finally:
+            total = time.perf_counter() - start
+            recorder.record(hostname, "connect", total)
+            recorder.record(hostname, "tcp_connect", max(total - _current.handshake - _current.auth, 0.0))
+    return wrapper
+
+def _wrap_sub_phase(phase, attribute):
+    def make_wrapper(original):
+        def wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(self, *args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                setattr(_current, attribute, getattr(_current, attribute, 0.0) + seconds)
+                recorder.record(current_device(), phase, seconds)
+        return wrapper
+    return make_wrapper
+
+def _wrap_netmiko_init(original):
+    def wrapper(self, *args, **kwargs):
+        device = kwargs.get("host") or kwargs.get("ip")
+        _current.device = device
+        _current.netmiko = True
+        try:
+            with recorder.phase(device, "netmiko_connect"):
+                return original(self, *args, **kwargs)
+        finally:
+            _current.netmiko = False
+    return wrapper
+
+def _wrap_netmiko_method(phase):
+    '''
+    The time is recorded even if the method fails(for example on read timeout). Only the outermost call is recorded,
+    so find_prompt inside send_command(or inside the connection setup) is not counted twice.
+    '''
+    def make_wrapper(original):
+        def wrapper(self, *args, **kwargs):
+            if getattr(_current, "netmiko", False):
+                return original(self, *args, **kwargs)
+            _current.device = self.host
+            _current.netmiko = True
+            output = None
+            start = time.perf_counter()
+            try:
+                output = original(self, *args, **kwargs)
+                return output
+            finally:
+                _current.netmiko = False
+                recorder.record(self.host, phase, time.perf_counter() - start, len(output) if isinstance(output, str) else 0)
+        return wrapper
+    return make_wrapper
+
+def install(phase_recorder = None):
+    '''
+    Allows to start recording: paramiko and netmiko methods are wrapped, recorder is returned.
+    '''
+    global recorder
+    import paramiko
+    from netmiko.base_connection import BaseConnection
+    if recorder is not None:
+        return recorder
+    recorder = phase_recorder or PhaseRecorder()
+    _patch(paramiko.SSHClient, "connect", _wrap_ssh_connect)
+    _patch(paramiko.Transport, "start_client", _wrap_sub_phase("ssh_handshake", "handshake"))
+    _patch(paramiko.SSHClient, "_auth", _wrap_sub_phase("auth", "auth"))
+    _patch(BaseConnection, "__init__", _wrap_netmiko_init)
+    for method in NETMIKO_METHODS:
+        _patch(BaseConnection, method, _wrap_netmiko_method(method))
+    return recorder
+
+def uninstall():
+    '''
+    Allows to stop recording and to restore original methods.
+    '''
+    global recorder
+    for (owner, name), original in _originals.items():
+        setattr(owner, name, original)
+    _originals.clear()
+    recorder = None